@@ -0,0 +1,66 @@
+'''Benchmarks the business queries against the materialized summaries at increasing order volumes.
+
+For each requested number of orders, synthetic store, product, date event and order tables, with every order referencing a
+store, product and date event, are cleaned and uploaded to a Postgresql database. The summaries in summary_views.sql are
+created and refreshed, and each business query is timed. The time taken by the queries should stay flat as the number of
+orders grows, while only the refresh grows with it.
+
+Usage
+-----
+python -m benchmarks.bench_business_queries --rows 100000 1000000 --url postgresql+psycopg2://postgres@localhost/bench
+'''
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import URLConnector
+from benchmarks.synthetic import make_date_events, make_orders, make_products, make_stores
+from business_queries import run_queries
+from data_cleaning import DataCleaning
+from table_schemas import metadata
+
+
+def load_tables(connector, rows, seed=0):
+    '''Cleans and uploads synthetic tables with the given number of orders, each referencing a store, product and date event.'''
+    rng = np.random.default_rng(seed)
+    cleaner = DataCleaning()
+    stores = cleaner.clean_store_data(make_stores(450, seed)).drop_duplicates('store_code')
+    products = cleaner.clean_products_data(make_products(1850, seed)).drop_duplicates('product_code')
+    date_events = cleaner.clean_date_events(make_date_events(rows, seed))
+    orders = cleaner.clean_orders_data(make_orders(rows, seed))
+    orders['store_code'] = rng.choice(stores['store_code'].to_numpy(), rows)
+    orders['product_code'] = rng.choice(products['product_code'].to_numpy(), rows)
+    orders['date_uuid'] = rng.choice(date_events['date_uuid'].to_numpy(), rows)
+    for dataframe, table in [(stores, 'dim_store_details'), (products, 'dim_products'), (date_events, 'dim_date_times'),
+                             (orders, 'orders_table')]:
+        connector.upload_to_db(dataframe, table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--url', required=True, help='SQLAlchemy URL of a Postgresql database')
+    args = parser.parse_args()
+
+    connector = URLConnector(args.url, metadata=metadata)
+    try:
+        for rows in args.rows:
+            load_tables(connector, rows)
+            start = time.perf_counter()
+            connector.run_sql_file('summary_views.sql')
+            connector.refresh_materialized_views()
+            refresh = time.perf_counter() - start
+            timings = []
+            for task in range(1, 10):
+                start = time.perf_counter()
+                run_queries(connector, [task])
+                timings.append(time.perf_counter() - start)
+            print(f'{rows:>9} orders  refresh {refresh:7.2f}s  queries ' +
+                  ' '.join(f'{task}:{seconds * 1000:.0f}ms' for task, seconds in enumerate(timings, 1)))
+    finally:
+        connector.dispose()
+
+
+if __name__ == '__main__':
+    main()
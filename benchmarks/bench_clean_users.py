@@ -0,0 +1,64 @@
+'''Benchmarks DataCleaning.clean_user_data() against the original row-wise implementation.
+
+Generates synthetic legacy_users frames of each requested size, cleans copies of them with the original implementation
+(row-wise apply lambdas and repeated index-based drops) and with the current vectorised one, checks the outputs are
+identical, once the country columns the current one stores as categoricals are cast back to strings, and reports the time
+taken by each.
+
+Usage
+-----
+python -m benchmarks.bench_clean_users --rows 100000 1000000 10000000 --baseline-limit 1000000
+'''
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_users
+from data_cleaning import DataCleaning
+
+
+def original_clean_user_data(dataframe):
+    '''The original implementation of DataCleaning.clean_user_data().'''
+    users = dataframe
+    users.drop('index', axis=1, inplace=True)
+    users.drop(users[users.first_name == 'NULL'].index, inplace=True)
+    users.drop(users[users['user_uuid'].str.len() != 36].index, inplace=True)
+    users['address'] = users['address'].str.replace('\n', ' ')
+    users['date_of_birth'] = pd.to_datetime(users['date_of_birth'])
+    users['join_date'] = pd.to_datetime(users['join_date'])
+    users['country_code'] = users['country_code'].apply(lambda x: 'GB' if x == 'GGB' else x)
+    users['phone_number'] = users['phone_number'].str.replace(r'\+1|\+44|\+49|x\w+', '', regex=True)
+    users['phone_number'] = users['phone_number'].str.replace(r'\D+', '', regex=True)
+    users['phone_number'] = users.apply(lambda x: x['phone_number'][-10:] if x['country_code'] == 'US' else x['phone_number'], axis=1)
+    users['phone_number'] = users.apply(lambda x: '0' + x['phone_number'] if x['country_code'] == 'GB' and x['phone_number'][0] != '0' else x['phone_number'], axis=1)
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--baseline-limit', type=int, default=1000000,
+                        help='largest frame to also clean with the slow original implementation')
+    args = parser.parse_args()
+
+    cleaner = DataCleaning()
+    for rows in args.rows:
+        users = make_users(rows)
+        start = time.perf_counter()
+        cleaned = cleaner.clean_user_data(users.copy())
+        vectorised = time.perf_counter() - start
+        line = f'{rows:>9} rows  vectorised {vectorised:8.2f}s'
+        if rows <= args.baseline_limit:
+            start = time.perf_counter()
+            expected = original_clean_user_data(users.copy())
+            baseline = time.perf_counter() - start
+            # the original kept every column as strings
+            strings = cleaned.astype({column: object for column in cleaned.select_dtypes('category')})
+            pd.testing.assert_frame_equal(strings, expected)
+            line += f'  original {baseline:8.2f}s  ({baseline / vectorised:.1f}x, identical output)'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+'''Reports the memory used by each table before and after cleaning.
+
+Generates synthetic raw versions of every source table at the requested size, cleans them with DataCleaning and reports
+the bytes each uses before and after cleaning, counting the contents of strings, along with the largest columns left.
+
+Usage
+-----
+python -m benchmarks.bench_cleaning_memory --rows 100000
+'''
+import argparse
+
+from benchmarks.synthetic import make_cards, make_date_events, make_orders, make_products, make_stores, make_users
+from data_cleaning import DataCleaning, memory_report
+
+TABLES = [
+    ('dim_users', make_users, 'clean_user_data'),
+    ('dim_card_details', make_cards, 'clean_card_data'),
+    ('dim_store_details', make_stores, 'clean_store_data'),
+    ('dim_products', make_products, 'clean_products_data'),
+    ('orders_table', make_orders, 'clean_orders_data'),
+    ('dim_date_times', make_date_events, 'clean_date_events'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    cleaner = DataCleaning()
+    print(f'{"table":<18} {"before":>10} {"after":>10}  largest columns after cleaning')
+    for table, make, method in TABLES:
+        raw = make(args.rows)
+        # the cleaners may modify the frame they're given, so measure it first
+        report = memory_report(raw.copy(), getattr(cleaner, method)(raw))
+        largest = sorted(report['column_bytes_after'].items(), key=lambda item: item[1], reverse=True)[:3]
+        print(f'{table:<18} {report["bytes_before"] / 2**20:8.1f}MB {report["bytes_after"] / 2**20:8.1f}MB  '
+              + ', '.join(f'{column} {size / 2**20:.1f}MB' for column, size in largest))
+
+
+if __name__ == '__main__':
+    main()
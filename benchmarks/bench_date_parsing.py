@@ -0,0 +1,40 @@
+'''Benchmarks DateParser.parse() against calling pd.to_datetime() without a format, as the cleaners used to.
+
+Generates columns of date strings in the mix of formats found in the sources, parses them both ways, checks the results are
+identical and reports the time taken by each and the number of values parsed with each format.
+
+Usage
+-----
+python -m benchmarks.bench_date_parsing --rows 100000 1000000 10000000
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import _dates
+from date_parsing import DateParser
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        dates = pd.Series(_dates(np.random.default_rng(0), rows))
+        start = time.perf_counter()
+        expected = pd.to_datetime(dates)
+        inferred = time.perf_counter() - start
+        date_parser = DateParser()
+        start = time.perf_counter()
+        parsed = date_parser.parse(dates)
+        ranked = time.perf_counter() - start
+        pd.testing.assert_series_equal(parsed, expected)
+        print(f'{rows:>9} rows  inferred {inferred:8.2f}s  ranked formats {ranked:8.2f}s  '
+              f'({inferred / ranked:.1f}x, identical output)  {dict(date_parser.counts)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+'''Benchmarks the cold-start import cost of each pipeline job, as measured by python -X importtime.
+
+Each job is run with Pipeline.run_job() in a fresh interpreter, against local stand-ins for its sources and the local
+database: a SQLite file in place of RDS, another in place of the local Postgresql database, and a local HTTP server serving
+a synthetic card details .pdf, store api records, products .csv and date details .json in place of the store api and S3.
+The time spent importing the pipeline, and whatever the job then imports as it runs, is reported along with the heaviest
+packages loaded, against importing all of those modules at once, as every job did when the pipeline imported every module
+eagerly. Each measurement is repeated and the fastest kept.
+
+The stand-ins differ from the real sources in a few ways: products are read over http rather than with s3fs, the SQL files
+of the schema and summaries jobs, which are written for Postgresql, aren't run, and the standard library modules the HTTP
+server uses are imported before the job starts, so aren't counted.
+
+Usage
+-----
+python -m benchmarks.bench_import_time --repeat 5
+python -m benchmarks.bench_import_time --jobs schema cards
+'''
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from pipeline import JOBS
+
+EAGER = 'eager (every job, before)'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# written to standard error by the stand-in interpreter as the job starts
+MARKER = '--- job started ---'
+
+
+def write_sources(directory, rows):
+    '''Writes the synthetic data the stand-ins serve to a directory: a SQLite database of the RDS tables and the files.'''
+    import sqlalchemy
+    from benchmarks.bench_pdf_extraction import write_card_pdf
+    from benchmarks.synthetic import make_date_events, make_orders, make_products, make_stores, make_users
+    engine = sqlalchemy.create_engine('sqlite:///' + os.path.join(directory, 'rds.db'))
+    make_users(rows).to_sql('legacy_users', engine, index=False)
+    make_orders(rows).to_sql('orders_table', engine, index=False)
+    engine.dispose()
+    files = os.path.join(directory, 'files')
+    os.makedirs(os.path.join(files, 'store_details'))
+    write_card_pdf(os.path.join(files, 'card_details.pdf'), pages=1)
+    make_products(rows).drop(columns='Unnamed: 0').to_csv(os.path.join(files, 'products.csv'))
+    make_date_events(rows).to_json(os.path.join(files, 'date_details.json'))
+    # the store api answers with one record per store, served here as one file per store number
+    stores = make_stores(min(rows, 50)).to_json(orient='records', lines=True).splitlines()
+    with open(os.path.join(files, 'number_stores'), 'w') as file:
+        file.write(f'{{"statusCode": 200, "number_stores": {len(stores)}}}')
+    for number, record in enumerate(stores):
+        with open(os.path.join(files, 'store_details', str(number)), 'w') as file:
+            file.write(record)
+
+
+def run_stand_in(jobs, directory):
+    '''Runs jobs one at a time with Pipeline.run_job(), against the stand-ins for the sources written to a directory.
+
+    For use in a fresh interpreter started by stand_in_import_times(), which measures the imports made after MARKER.
+    '''
+    import functools
+    import threading
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    import pipeline
+    from benchmarks.common import URLConnector
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    handler = functools.partial(QuietHandler, directory=os.path.join(directory, 'files'))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/'
+    pipeline.CARD_DETAILS_LINK = base_url + 'card_details.pdf'
+    pipeline.PRODUCTS_ENDPOINT = base_url + 'products.csv'
+    pipeline.DATE_DETAILS_ENDPOINT = base_url + 'date_details.json'
+
+    class StandInPipeline(pipeline.Pipeline):
+        @property
+        def extractor(self):
+            extractor = pipeline.Pipeline.extractor.fget(self)
+            extractor.number_of_stores_endpoint = base_url + 'number_stores'
+            extractor.get_store_endpoint = base_url + 'store_details/'
+            return extractor
+
+    # the .pdf reader's worker processes would otherwise inherit -X importtime and report their imports too
+    sys._xoptions.pop('importtime', None)
+    # a new cache for each run, so that every extract is a miss
+    with StandInPipeline(cache_dir=tempfile.mkdtemp(dir=directory),
+                         reject_file=os.path.join(directory, 'rejected_orders.csv')) as stand_in:
+        stand_in.source_connector = URLConnector('sqlite:///' + os.path.join(directory, 'rds.db'))
+        stand_in.target_connector = URLConnector('sqlite:///' + os.path.join(directory, 'local.db'),
+                                                 metadata=pipeline.metadata)
+        # the schema and summary SQL files are written for Postgresql
+        for method in ['run_sql_file', 'validate_constraints', 'refresh_materialized_views', 'rebuild_materialized_views']:
+            setattr(stand_in.target_connector, method, lambda *args, **kwargs: None)
+        print(MARKER, file=sys.stderr, flush=True)
+        for job in jobs:
+            stand_in.run_job(job)
+
+
+def top_level_import_times(stderr):
+    '''Returns the microseconds each top-level import of the pipeline, and each after MARKER, took in importtime output.'''
+    times = {}
+    started = False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            started = True
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented beneath the import that triggered them
+        if len(name) - len(name.lstrip()) == 1 and (started or name.strip() == 'pipeline'):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def stand_in_import_times(jobs, directory, importtime=True):
+    '''Runs jobs in a fresh interpreter against the stand-ins, returning the microseconds each top-level import took.'''
+    flags = ['-X', 'importtime'] if importtime else []
+    result = subprocess.run([sys.executable, *flags, '-m', 'benchmarks.bench_import_time', '--run-stand-in', *jobs,
+                             '--sources', directory], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(jobs)} failed against the stand-ins:\n{result.stderr[-2000:]}")
+    return top_level_import_times(result.stderr)
+
+
+def eager_import_times(modules):
+    '''Imports the pipeline and then the given modules in a fresh interpreter, returning the microseconds each took.'''
+    statements = ['import pipeline', f'print({MARKER!r}, file=sys.stderr)'] + [f'import {module}' for module in modules]
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import sys; ' + '; '.join(statements)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return top_level_import_times(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', nargs='+', choices=list(JOBS), default=list(JOBS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=3, help='number of heaviest packages listed for each job')
+    parser.add_argument('--rows', type=int, default=1000, help='rows of each synthetic source table')
+    parser.add_argument('--run-stand-in', nargs='+', choices=list(JOBS), help=argparse.SUPPRESS)
+    parser.add_argument('--sources', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_stand_in:
+        run_stand_in(args.run_stand_in, args.sources)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_sources(directory, args.rows)
+        # load every table once, dimension tables first, so that any job can run on its own, as after an earlier run
+        loads = sorted((job for job in JOBS if job not in ('schema', 'summaries')), key=lambda job: job == 'orders')
+        stand_in_import_times(loads, directory, importtime=False)
+        fastest = {}
+        for job in args.jobs:
+            runs = [stand_in_import_times([job], directory) for _ in range(args.repeat)]
+            fastest[job] = min(runs, key=lambda times: sum(times.values()))
+    modules = list(dict.fromkeys(module for times in fastest.values() for module in times if module != 'pipeline'))
+    fastest[EAGER] = min((eager_import_times(modules) for _ in range(args.repeat)), key=lambda times: sum(times.values()))
+    for job, times in fastest.items():
+        heaviest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(f'{job:>26}  {sum(times.values()) / 1000:8.1f}ms  '
+              + '  '.join(f'{name} {microseconds / 1000:.0f}ms' for name, microseconds in heaviest))
+
+
+if __name__ == '__main__':
+    main()
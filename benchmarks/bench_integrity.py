@@ -0,0 +1,70 @@
+'''Benchmarks IntegrityChecker.check() on orders referencing the keys of the dimension tables.
+
+Uploads synthetic dimension tables to a temporary SQLite database, reads their keys with IntegrityChecker.load_keys() and
+checks synthetic orders against them in chunks, with a small share of each foreign key pointing at rows that don't exist.
+Reports the time taken and the orphan orders found for each foreign key.
+
+Usage
+-----
+python -m benchmarks.bench_integrity --rows 1000000 10000000 --orphans 0.001
+'''
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import URLConnector
+from benchmarks.synthetic import _uuids, make_cards, make_date_events, make_orders, make_products, make_stores, make_users
+from data_cleaning import DataCleaning
+from integrity import IntegrityChecker
+from table_schemas import metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000])
+    parser.add_argument('--orphans', type=float, default=0.001, help='share of each foreign key referencing no row')
+    parser.add_argument('--chunk-rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cleaner = DataCleaning()
+    dimensions = {
+        'dim_users': cleaner.clean_user_data(make_users(15000)),
+        'dim_card_details': cleaner.clean_card_data(make_cards(15000)),
+        'dim_store_details': cleaner.clean_store_data(make_stores(450)),
+        'dim_products': cleaner.clean_products_data(make_products(1850)),
+        'dim_date_times': cleaner.clean_date_events(make_date_events(120000)),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        connector = URLConnector('sqlite:///' + os.path.join(directory, 'bench.db'))
+        for table, dataframe in dimensions.items():
+            connector.upload_to_db(dataframe, table)
+        for rows in args.rows:
+            orders = make_orders(min(rows, args.chunk_rows))
+            for foreign_key in metadata.tables['orders_table'].foreign_keys:
+                column, referenced = foreign_key.parent.name, foreign_key.column
+                keys = dimensions[referenced.table.name][referenced.name].to_numpy()
+                values = rng.choice(keys, len(orders))
+                orphans = rng.random(len(orders)) < args.orphans
+                if column == 'card_number':
+                    # card numbers are read from the RDS database as integers
+                    values = values.astype('int64')
+                    values[orphans] = 1
+                else:
+                    values[orphans] = _uuids(rng, orphans.sum()) if column.endswith('uuid') else 'MISSING'
+                orders[column] = values
+            checker = IntegrityChecker(metadata.tables['orders_table'], 'quarantine')
+            checker.load_keys(connector)
+            start = time.perf_counter()
+            kept = sum(len(checker.check(orders)) for _ in range(0, rows, args.chunk_rows))
+            seconds = time.perf_counter() - start
+            print(f'{rows:>9} orders  checked in {seconds:6.2f}s  ({rows / seconds:10.0f} rows/s)  kept {kept}  '
+                  f'orphans {checker.rejected}')
+        connector.dispose()
+
+
+if __name__ == '__main__':
+    main()
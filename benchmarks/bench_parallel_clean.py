@@ -0,0 +1,44 @@
+'''Benchmarks DataCleaning.parallel_clean() against cleaning each table in a single process.
+
+Generates synthetic raw versions of every source table, cleans each once with its DataCleaning method and once in chunks
+across a pool of processes with parallel_clean(), checks both produce the same DataFrame and reports the time taken by each.
+
+Usage
+-----
+python -m benchmarks.bench_parallel_clean --rows 1000000 --workers 8 --chunk-rows 100000
+'''
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.suite import TABLES
+from data_cleaning import DataCleaning
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=list(TABLES))
+    args = parser.parse_args()
+
+    cleaner = DataCleaning()
+    for table in args.tables:
+        make, method = TABLES[table]
+        raw = make(args.rows)
+        start = time.perf_counter()
+        expected = getattr(cleaner, method)(raw.copy())
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        cleaned = cleaner.parallel_clean(method, raw.copy(), n_workers=args.workers, chunk_rows=args.chunk_rows)
+        parallel = time.perf_counter() - start
+        pd.testing.assert_frame_equal(cleaned, expected)
+        print(f'{method:<22} {args.rows:>9} rows  serial {serial:7.2f}s  '
+              f'parallel ({args.workers} workers) {parallel:7.2f}s  ({serial / parallel:.1f}x, identical output)')
+
+
+if __name__ == '__main__':
+    main()
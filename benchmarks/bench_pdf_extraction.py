@@ -0,0 +1,100 @@
+'''Benchmarks DataExtractor.retrieve_pdf_data() against the original single tabula.read_pdf() call.
+
+Generates a card details .pdf of the requested number of pages, each holding a ruled table of synthetic card records, then
+reads it once with a single tabula.read_pdf(pages='all') call and once with the parallel per-page reader, checking both
+produce the same rows.
+
+Usage
+-----
+python -m benchmarks.bench_pdf_extraction --pages 200 --workers 8
+'''
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import tabula
+
+from data_extraction import DataExtractor
+
+COLUMNS = ['card_number', 'expiry_date', 'card_provider', 'date_payment_confirmed']
+COLUMN_X = [40, 200, 290, 450]
+ROWS_PER_PAGE = 40
+
+
+def write_card_pdf(path, pages, seed=0):
+    '''Writes a .pdf file of the given number of pages, each with a ruled table of ROWS_PER_PAGE card records.'''
+    rng = np.random.default_rng(seed)
+    providers = ['VISA 16 digit', 'Diners Club / Carte Blanche', 'JCB 16 digit', 'Mastercard', 'American Express']
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_ids = []
+    for _ in range(pages):
+        rows = [COLUMNS] + [[str(rng.integers(10**15, 10**16)), f'{rng.integers(1, 13):02d}/{rng.integers(23, 33)}',
+                             providers[rng.integers(len(providers))],
+                             f'20{rng.integers(10, 23)}-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}']
+                            for _ in range(ROWS_PER_PAGE)]
+        top, height, right = 800, 18, 560
+        commands = ['0.5 w']
+        for number in range(len(rows) + 1):
+            y = top - number * height
+            commands.append(f'{COLUMN_X[0] - 5} {y} m {right} {y} l S')
+        for x in COLUMN_X + [right]:
+            x = x - 5 if x != right else x
+            commands.append(f'{x} {top} m {x} {top - len(rows) * height} l S')
+        for number, row in enumerate(rows):
+            y = top - (number + 1) * height + 5
+            for x, value in zip(COLUMN_X, row):
+                commands.append(f'BT /F1 9 Tf {x} {y} Td ({value}) Tj ET')
+        stream = '\n'.join(commands)
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {len(objects)} 0 R '
+                       '/Resources << /Font << /F1 3 0 R >> >> >>')
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{id} 0 R' for id in page_ids)}] /Count {pages} >>"
+    with open(path, 'wb') as file:
+        file.write(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+        xref = file.tell()
+        file.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode())
+        for offset in offsets:
+            file.write(f'{offset:010d} 00000 n \n'.encode())
+        file.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--pages-per-task', type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'card_details.pdf')
+        write_card_pdf(path, args.pages)
+
+        start = time.perf_counter()
+        expected = pd.concat(tabula.read_pdf(path, pages='all'))
+        single = time.perf_counter() - start
+
+        page_seconds = []
+        def progress(first_page, last_page, seconds, pages_read, number_of_pages):
+            page_seconds.append(seconds / (last_page - first_page + 1))
+        extractor = DataExtractor(pdf_workers=args.workers, pdf_pages_per_task=args.pages_per_task)
+        start = time.perf_counter()
+        cards = extractor.retrieve_pdf_data(path, progress=progress)
+        parallel = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(cards.reset_index(drop=True), expected.reset_index(drop=True))
+        print(f'{args.pages} pages, {len(cards)} rows')
+        print(f'  single read_pdf call       {single:8.2f}s')
+        print(f'  parallel ({args.workers} workers)       {parallel:8.2f}s  ({single / parallel:.1f}x)')
+        print(f'  mean task time per page    {np.mean(page_seconds):8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+'''Benchmarks peak memory of eager against streamed RDS extract -> clean -> upload.
+
+Builds a SQLite stand-in for the RDS orders_table with the requested number of rows, then runs the orders job twice, once
+reading the whole table with DataExtractor.read_rds_table() and once streaming it in chunks, measuring the peak memory
+allocated by each run with tracemalloc. The streamed peak should stay flat as the table grows.
+
+Usage
+-----
+python -m benchmarks.bench_rds_streaming --rows 100000 1000000 --chunksize 50000
+'''
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import URLConnector
+from data_cleaning import DataCleaning
+from data_extraction import DataExtractor
+
+
+def build_orders_table(connector, rows, seed=0):
+    '''Writes a synthetic orders_table of the given number of rows to the connector's database.'''
+    rng = np.random.default_rng(seed)
+    chunksize = 100000
+    for start in range(0, rows, chunksize):
+        size = min(chunksize, rows - start)
+        index = np.arange(start, start + size)
+        chunk = pd.DataFrame({
+            'level_0': index,
+            'index': index,
+            'date_uuid': [f'{value:08x}-0000-4000-8000-000000000000' for value in rng.integers(0, 2**32, size)],
+            'first_name': None,
+            'last_name': None,
+            'user_uuid': [f'{value:08x}-1111-4000-8000-000000000000' for value in rng.integers(0, 2**32, size)],
+            'card_number': rng.integers(10**15, 10**16, size),
+            'store_code': [f'WEB-{value:07d}' for value in rng.integers(0, 500, size)],
+            'product_code': [f'A{value}-{value * 7 % 10000:04d}' for value in rng.integers(0, 1000, size)],
+            '1': None,
+            'product_quantity': rng.integers(1, 14, size),
+        })
+        chunk.to_sql('orders_table', connector.init_db_engine(), index=False,
+                     if_exists='replace' if start == 0 else 'append')
+
+
+def run_job(source, target, chunksize):
+    '''Runs the orders extract -> clean -> upload job, returning (seconds, peak bytes allocated).'''
+    extractor, cleaner = DataExtractor(), DataCleaning()
+    tracemalloc.start()
+    start = time.perf_counter()
+    orders = extractor.read_rds_table(source, 'orders_table', chunksize=chunksize)
+    if chunksize is None:
+        target.upload_to_db(cleaner.clean_orders_data(orders), 'orders_table')
+    else:
+        target.upload_to_db((cleaner.clean_orders_data(chunk) for chunk in orders), 'orders_table')
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = URLConnector('sqlite:///' + os.path.join(directory, 'rds.db'))
+        target = URLConnector('sqlite:///' + os.path.join(directory, 'local.db'))
+        for rows in args.rows:
+            build_orders_table(source, rows)
+            for mode, chunksize in (('eager', None), (f'streamed ({args.chunksize} rows)', args.chunksize)):
+                seconds, peak = run_job(source, target, chunksize)
+                print(f'{rows:>9} rows  {mode:<24} {seconds:8.2f}s  peak {peak / 2**20:8.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
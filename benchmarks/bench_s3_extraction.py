@@ -0,0 +1,91 @@
+'''Benchmarks DataExtractor.extract_from_s3() against the original eager pandas readers.
+
+Writes a synthetic products table as .csv, gzip and zstd compressed .csv and .parquet files, and a synthetic date details
+table as .json and newline-delimited .json files, to a temporary directory. Each file is then read from a local HTTP server
+serving the directory, as a stand-in for S3, and from a file:// URL: once with pandas read_csv() or read_json() where pandas
+can read it (the original implementation) and once with extract_from_s3(), which streams and sniffs the file.
+
+Usage
+-----
+python -m benchmarks.bench_s3_extraction --rows 1000000
+'''
+import argparse
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.synthetic import make_date_events, make_products
+from data_extraction import DataExtractor
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    '''Serves files from a directory without logging each request.'''
+    def log_message(self, format, *args):
+        pass
+
+
+def write_files(directory, rows):
+    '''Writes the synthetic files to be read, returning their names and the pandas reader that can read each, if any.'''
+    products = make_products(rows).drop(columns='Unnamed: 0')
+    products.to_csv(os.path.join(directory, 'products.csv'))
+    products.to_csv(os.path.join(directory, 'products.csv.gz'))
+    with open(os.path.join(directory, 'products.csv'), 'rb') as file, \
+            pa.CompressedOutputStream(os.path.join(directory, 'products.csv.zst'), 'zstd') as compressed:
+        compressed.write(file.read())
+    products.to_parquet(os.path.join(directory, 'products.parquet'))
+    date_events = make_date_events(rows)
+    date_events.to_json(os.path.join(directory, 'date_details.json'))
+    date_events.to_json(os.path.join(directory, 'date_details.ndjson'), orient='records', lines=True)
+    return {'products.csv': pd.read_csv, 'products.csv.gz': pd.read_csv, 'products.csv.zst': None,
+            'products.parquet': None, 'date_details.json': pd.read_json,
+            'date_details.ndjson': functools.partial(pd.read_json, lines=True)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+
+    extractor = DataExtractor()
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, args.rows)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        prefixes = {'http': f'http://127.0.0.1:{server.server_port}/', 'file': 'file://' + directory + '/'}
+        try:
+            for name, reader in files.items():
+                megabytes = os.path.getsize(os.path.join(directory, name)) / 2**20
+                for scheme, prefix in prefixes.items():
+                    if name.endswith('.parquet') and scheme == 'http':
+                        # http.server doesn't support the range requests Parquet files are read with
+                        continue
+                    url = prefix + name
+                    line = f'{name:<20} {scheme:<5} {megabytes:7.1f}MB'
+                    if reader is not None:
+                        start = time.perf_counter()
+                        expected = reader(url)
+                        baseline = time.perf_counter() - start
+                        line += f'  pandas {baseline:6.2f}s'
+                    else:
+                        line += f'  pandas {"-":>6} '
+                    start = time.perf_counter()
+                    rows = sum(len(chunk) for chunk in extractor.extract_from_s3(url, chunksize=args.chunksize))
+                    streamed = time.perf_counter() - start
+                    line += f'  streamed {streamed:6.2f}s  {megabytes / streamed:7.1f}MB/s'
+                    if reader is not None:
+                        assert rows == len(expected)
+                        line += f'  ({baseline / streamed:.1f}x)'
+                    print(line)
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
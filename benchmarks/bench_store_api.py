@@ -0,0 +1,94 @@
+'''Benchmarks DataExtractor.retrieve_stores_data() against a local stub of the stores api.
+
+Starts a threaded HTTP server on localhost that answers the number_stores and store_details endpoints, optionally adding a
+fixed latency to every response to mimic the round trip to AWS, then times the original sequential loop against the
+concurrent extractor.
+
+Usage
+-----
+python -m benchmarks.bench_store_api --stores 1000 10000 --latency 0.005 --workers 32
+'''
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pandas as pd
+import requests
+
+from data_extraction import DataExtractor
+
+
+def make_handler(number_of_stores, latency):
+    '''Returns a request handler class serving number_of_stores synthetic store records.'''
+    class StubStoreApi(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # allow keep-alive connections
+
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path.endswith('/number_stores'):
+                body = {'statusCode': 200, 'number_stores': number_of_stores}
+            else:
+                store_number = int(self.path.rsplit('/', 1)[-1])
+                body = {'index': store_number, 'address': f'{store_number} High Street', 'longitude': '-0.12',
+                        'lat': None, 'locality': 'London', 'store_code': f'LO-{store_number:08X}',
+                        'staff_numbers': '34', 'opening_date': '2005-12-02', 'store_type': 'Local',
+                        'latitude': '51.50', 'country_code': 'GB', 'continent': 'Europe'}
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+    return StubStoreApi
+
+
+def sequential_baseline(extractor):
+    '''The original implementation: one blocking request per store and a pd.concat per record.'''
+    stores = pd.DataFrame()
+    for store_number in range(0, extractor.list_number_of_stores()):
+        response = requests.get(extractor.get_store_endpoint + str(store_number), headers=extractor.api_header)
+        stores = pd.concat([stores, pd.DataFrame(response.json(), index=[0])], ignore_index=True)
+    return stores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stores', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds added to every stub response')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--skip-baseline', action='store_true', help='only time the concurrent extractor')
+    args = parser.parse_args()
+
+    for number_of_stores in args.stores:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(number_of_stores, args.latency))
+        server.daemon_threads = True
+        Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}/prod/'
+
+        extractor = DataExtractor(max_workers=args.workers)
+        extractor.number_of_stores_endpoint = base_url + 'number_stores'
+        extractor.get_store_endpoint = base_url + 'store_details/'
+
+        timings = {}
+        if not args.skip_baseline:
+            start = time.perf_counter()
+            sequential_baseline(extractor)
+            timings['sequential'] = time.perf_counter() - start
+        start = time.perf_counter()
+        stores = extractor.retrieve_stores_data()
+        timings[f'concurrent ({args.workers} workers)'] = time.perf_counter() - start
+        assert len(stores) == number_of_stores
+
+        for name, seconds in timings.items():
+            print(f'{number_of_stores:>7} stores  {name:<26} {seconds:8.2f}s  {number_of_stores / seconds:10.0f} stores/s')
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
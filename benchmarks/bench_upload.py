@@ -0,0 +1,60 @@
+'''Benchmarks DatabaseConnector.upload_to_db() against the original row-by-row to_sql() upload.
+
+Generates a synthetic orders table and uploads it to each target database, once with pandas to_sql() using its default
+INSERT method (the original implementation) and once with upload_to_db(), which uses COPY FROM STDIN on Postgresql and
+multi-row INSERTs elsewhere, reporting rows per second for each.
+
+Usage
+-----
+python -m benchmarks.bench_upload --rows 100000 --url sqlite:///bench.db postgresql+psycopg2://postgres@localhost/bench
+'''
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import URLConnector
+
+
+def make_orders(rows, seed=0):
+    '''Returns a synthetic cleaned orders DataFrame of the given number of rows.'''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date_uuid': [f'{value:08x}-0000-4000-8000-000000000000' for value in rng.integers(0, 2**32, rows)],
+        'user_uuid': [f'{value:08x}-1111-4000-8000-000000000000' for value in rng.integers(0, 2**32, rows)],
+        'card_number': rng.integers(10**15, 10**16, rows).astype(str),
+        'store_code': [f'WEB-{value:07d}' for value in rng.integers(0, 500, rows)],
+        'product_code': [f'A{value}-{value * 7 % 10000:04d}' for value in rng.integers(0, 1000, rows)],
+        'product_quantity': rng.integers(1, 14, rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--url', nargs='+', help='SQLAlchemy URLs of target databases (default: temporary SQLite file)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        urls = args.url or ['sqlite:///' + os.path.join(directory, 'bench.db')]
+        for url in urls:
+            connector = URLConnector(url)
+            engine = connector.init_db_engine()
+            for rows in args.rows:
+                orders = make_orders(rows)
+                start = time.perf_counter()
+                orders.to_sql('orders_table', engine, index=False, if_exists='replace')
+                baseline = time.perf_counter() - start
+                start = time.perf_counter()
+                connector.upload_to_db(orders, 'orders_table')
+                bulk = time.perf_counter() - start
+                print(f'{engine.dialect.name:<11} {rows:>9} rows  to_sql {rows / baseline:10.0f} rows/s  '
+                      f'upload_to_db {rows / bulk:10.0f} rows/s  ({baseline / bulk:.1f}x)')
+            connector.dispose()
+
+
+if __name__ == '__main__':
+    main()
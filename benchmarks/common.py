@@ -0,0 +1,8 @@
+'''Helpers shared between the benchmark scripts.'''
+from database_utils import DatabaseConnector
+
+
+class URLConnector(DatabaseConnector):
+    '''DatabaseConnector for a SQLAlchemy database URL, such as a local SQLite file, instead of a YAML credentials file.'''
+    def connection_string(self):
+        return self.filename
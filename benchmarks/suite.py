@@ -0,0 +1,135 @@
+'''Runs every cleaning and upload benchmark at several scales, saving the results as JSON so that runs can be compared.
+
+For each requested number of rows, synthetic raw versions of every source table are generated, each is cleaned with its
+DataCleaning method and the cleaned table is uploaded with DatabaseConnector.upload_to_db() to each target database. Every
+measurement is repeated and the fastest and median times kept. The results are written, along with the commit, library
+versions and machine they were measured on, to a JSON file, and can be compared against the results of an earlier run.
+
+Usage
+-----
+python -m benchmarks.suite --rows 10000 100000 1000000 --url postgresql+psycopg2://postgres@localhost/bench
+python -m benchmarks.suite --rows 10000 100000 --compare benchmarks/results/20240101-120000.json
+'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import URLConnector
+from benchmarks.synthetic import make_cards, make_date_events, make_orders, make_products, make_stores, make_users
+from data_cleaning import DataCleaning
+
+# each table's generator and cleaning method
+TABLES = {
+    'dim_users': (make_users, 'clean_user_data'),
+    'dim_card_details': (make_cards, 'clean_card_data'),
+    'dim_store_details': (make_stores, 'clean_store_data'),
+    'dim_products': (make_products, 'clean_products_data'),
+    'orders_table': (make_orders, 'clean_orders_data'),
+    'dim_date_times': (make_date_events, 'clean_date_events'),
+}
+# results more than this much slower than the baseline are flagged as regressions
+REGRESSION_THRESHOLD = 1.1
+
+
+def measure(function, repeat):
+    '''Calls a function repeat times, returning its last result and the fastest and median seconds taken.'''
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return result, min(seconds), statistics.median(seconds)
+
+
+def environment():
+    '''Returns the commit, library versions and machine the benchmarks are run on.'''
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'machine': platform.platform(), 'cpus': os.cpu_count(),
+            'started': datetime.datetime.now().isoformat(timespec='seconds')}
+
+
+def run(rows_list, urls, repeat, tables):
+    '''Runs the benchmarks, printing each result as it is measured and returning them all.'''
+    cleaner = DataCleaning()
+    connectors = [URLConnector(url) for url in urls]
+    results = []
+    try:
+        for rows in rows_list:
+            for table in tables:
+                make, method = TABLES[table]
+                raw = make(rows)
+                # the cleaners may modify the frame they're given, so each repetition cleans a fresh copy
+                cleaned, fastest, median = measure(lambda: getattr(cleaner, method)(raw.copy()), repeat)
+                results.append({'stage': method, 'table': table, 'target': None, 'rows': rows,
+                                'rows_out': len(cleaned), 'fastest_seconds': fastest, 'median_seconds': median})
+                print(f'{method:<24} {"":<11} {rows:>9} rows  {fastest:8.3f}s  {rows / fastest:10.0f} rows/s')
+                for connector in connectors:
+                    dialect = connector.init_db_engine().dialect.name
+                    _, fastest, median = measure(lambda: connector.upload_to_db(cleaned, table), repeat)
+                    results.append({'stage': 'upload_to_db', 'table': table, 'target': dialect, 'rows': len(cleaned),
+                                    'rows_out': len(cleaned), 'fastest_seconds': fastest, 'median_seconds': median})
+                    print(f'{"upload " + table:<24} {dialect:<11} {len(cleaned):>9} rows  {fastest:8.3f}s  '
+                          f'{len(cleaned) / fastest:10.0f} rows/s')
+    finally:
+        for connector in connectors:
+            connector.dispose()
+    return results
+
+
+def compare(results, baseline):
+    '''Prints the ratio of each result's fastest time to the matching result of a baseline run, flagging regressions.'''
+    key = lambda result: (result['stage'], result['table'], result['target'], result['rows'])
+    previous = {key(result): result for result in baseline['results']}
+    print(f"\ncompared with {baseline['environment'].get('commit')} ({baseline['environment'].get('started')})")
+    for result in results:
+        match = previous.get(key(result))
+        if match is None:
+            continue
+        ratio = result['fastest_seconds'] / match['fastest_seconds']
+        flag = '  REGRESSION' if ratio > REGRESSION_THRESHOLD else ''
+        print(f"{result['stage']:<24} {result['target'] or '':<11} {result['table']:<18} {result['rows']:>9} rows  "
+              f"{match['fastest_seconds']:8.3f}s -> {result['fastest_seconds']:8.3f}s  ({ratio:.2f}x){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=list(TABLES))
+    parser.add_argument('--url', nargs='*', default=[],
+                        help='SQLAlchemy URLs of target databases, in addition to a temporary SQLite file')
+    parser.add_argument('--repeat', type=int, default=3, help='number of times each measurement is repeated')
+    parser.add_argument('--output', help='JSON file to write the results to (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', metavar='FILE', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    run_environment = environment()
+    with tempfile.TemporaryDirectory() as directory:
+        urls = ['sqlite:///' + os.path.join(directory, 'bench.db')] + args.url
+        results = run(args.rows, urls, args.repeat, args.tables)
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                         datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({'environment': run_environment, 'results': results}, file, indent=2)
+    print(f'\nresults written to {output}')
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
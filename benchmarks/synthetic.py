@@ -0,0 +1,211 @@
+'''Seeded generators of realistically dirty versions of the pipeline's source tables.
+
+Each generator returns a raw DataFrame shaped like the corresponding extract, including the kinds of bad rows the cleaners
+remove: 'NULL' strings, mangled ids and codes, and the assorted date and phone number formats found in the real sources.
+'''
+import numpy as np
+import pandas as pd
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y %B %d', '%B %Y %d', '%Y/%m/%d']
+COUNTRIES = [('United Kingdom', 'GB'), ('Germany', 'DE'), ('United States', 'US')]
+
+
+def _choice(rng, values, size, p=None):
+    '''Returns an object array of size values drawn from values.'''
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def _uuids(rng, size):
+    '''Returns an object array of random uuid strings.'''
+    hex_digits = rng.integers(0, 16, size=(size, 32)).astype(np.uint8)
+    characters = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)[hex_digits].view('S32').ravel().astype(str)
+    return np.array([f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}' for h in characters], dtype=object)
+
+
+def _dates(rng, size, start='1940-01-01', end='2022-12-31', formats=DATE_FORMATS, p=(0.94, 0.02, 0.02, 0.02)):
+    '''Returns an object array of date strings in a mix of formats, mostly ISO.'''
+    start, end = pd.Timestamp(start).value // 10**9, pd.Timestamp(end).value // 10**9
+    dates = pd.to_datetime(rng.integers(start, end, size), unit='s').normalize()
+    formatted = np.empty(size, dtype=object)
+    chosen = rng.choice(len(formats), size=size, p=p)
+    for number, date_format in enumerate(formats):
+        mask = chosen == number
+        formatted[mask] = dates[mask].strftime(date_format)
+    return formatted
+
+
+def _junk(rng):
+    '''Returns a function producing random 10 character upper-case junk strings.'''
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'))
+    return lambda size: np.array([''.join(row) for row in letters[rng.integers(0, len(letters), (size, 10))]], dtype=object)
+
+
+def make_users(rows, seed=0):
+    '''Returns a raw legacy_users DataFrame of the given number of rows.'''
+    rng = np.random.default_rng(seed)
+    country_number = rng.choice(len(COUNTRIES), size=rows, p=(0.5, 0.3, 0.2))
+    country = np.array([name for name, _ in COUNTRIES], dtype=object)[country_number]
+    country_code = np.array([code for _, code in COUNTRIES], dtype=object)[country_number]
+    country_code[rng.random(rows) < 0.01] = 'GGB'
+    digits = rng.integers(10**9, 10**10, rows).astype(str).astype(object)
+    phone_formats = {
+        'GB': ['+44(0){0}', '0{0}', '({0})', '+44 {0}'],
+        'DE': ['+49(0){0}', '0{0}', '({0})'],
+        'US': ['+1-{0}x123', '001-{0}', '({0})', '{0}.'],
+    }
+    phone_number = np.empty(rows, dtype=object)
+    for code, templates in phone_formats.items():
+        mask = country_code == code if code != 'GB' else np.isin(country_code, ['GB', 'GGB'])
+        template = _choice(rng, templates, mask.sum())
+        phone_number[mask] = [t.format(d) for t, d in zip(template, digits[mask])]
+    users = pd.DataFrame({
+        'index': np.arange(rows),
+        'first_name': _choice(rng, ['Sigfried', 'Guy', 'Harry', 'Anna', 'Kerstin', 'Beth'], rows),
+        'last_name': _choice(rng, ['Noack', 'Allen', 'Lawrence', 'Fischer', 'Jones', 'Moore'], rows),
+        'date_of_birth': _dates(rng, rows, '1940-01-01', '2005-12-31'),
+        'company': _choice(rng, ['Heydrich Junitz KG', 'Fox-Bray', 'Johnson, Jones and Harris'], rows),
+        'email_address': _choice(rng, ['rudi79@winkler.de', 'danielle@example.com', 'guy@pearson.com'], rows),
+        'address': _choice(rng, ['Zimmerstr. 1/0\n59015 Gießen', 'Studio 22a\nLake Tracey\nLS2 3NQ', '1 Main St\nBoston'], rows),
+        'country': country,
+        'country_code': country_code,
+        'phone_number': phone_number,
+        'join_date': _dates(rng, rows, '1992-01-01', '2022-12-31'),
+        'user_uuid': _uuids(rng, rows),
+    })
+    # rows of 'NULL' strings, and rows whose fields are shifted junk
+    null_rows = rng.random(rows) < 0.002
+    users.loc[null_rows, users.columns[1:]] = 'NULL'
+    junk_rows = (rng.random(rows) < 0.002) & ~null_rows
+    for column in ['country_code', 'user_uuid', 'date_of_birth', 'join_date']:
+        users.loc[junk_rows, column] = _junk(rng)(junk_rows.sum())
+    return users
+
+
+def make_cards(rows, seed=0):
+    '''Returns a raw card details DataFrame of the given number of rows, indexed per page as if read from the .pdf file.'''
+    rng = np.random.default_rng(seed)
+    card_number = rng.integers(10**11, 10**16, rows).astype(object)
+    # some card numbers are read as strings with stray question marks
+    mangled = rng.random(rows) < 0.01
+    card_number[mangled] = ['??' + str(number) for number in card_number[mangled]]
+    cards = pd.DataFrame({
+        'card_number': card_number,
+        'expiry_date': [f'{month:02d}/{year}' for month, year in zip(rng.integers(1, 13, rows), rng.integers(23, 33, rows))],
+        'card_provider': _choice(rng, ['VISA 16 digit', 'JCB 16 digit', 'VISA 13 digit', 'JCB 15 digit', 'Discover',
+                                       'Maestro', 'Mastercard', 'American Express', 'Diners Club / Carte Blanche',
+                                       'VISA 19 digit'], rows),
+        'date_payment_confirmed': _dates(rng, rows, '1992-01-01', '2022-12-31'),
+    })
+    null_rows = rng.random(rows) < 0.002
+    cards.loc[null_rows] = 'NULL'
+    junk_rows = (rng.random(rows) < 0.002) & ~null_rows
+    for column in cards.columns:
+        cards.loc[junk_rows, column] = _junk(rng)(junk_rows.sum())
+    # each page of the .pdf file is read as a separate table of 50 rows
+    return cards.set_axis(np.arange(rows) % 50)
+
+
+def make_stores(rows, seed=0):
+    '''Returns a raw store details DataFrame of the given number of rows, the first of which is the web portal.'''
+    rng = np.random.default_rng(seed)
+    continents = {'GB': 'Europe', 'DE': 'Europe', 'US': 'America'}
+    country_code = _choice(rng, list(continents), rows, p=(0.6, 0.25, 0.15))
+    continent = np.array([continents[code] for code in country_code], dtype=object)
+    typo = rng.random(rows) < 0.01
+    continent[typo] = ['ee' + name for name in continent[typo]]
+    staff_numbers = rng.integers(5, 100, rows).astype(str).astype(object)
+    typo = rng.random(rows) < 0.01
+    staff_numbers[typo] = ['J' + number for number in staff_numbers[typo]]
+    stores = pd.DataFrame({
+        'index': np.arange(rows),
+        'address': _choice(rng, ['Flat 72W\nSally isle\nEast Deantown\nE7B 8EB, High Wycombe', '1 Main St\nBoston'], rows),
+        'longitude': rng.uniform(-10, 30, rows).round(5).astype(str).astype(object),
+        'lat': None,
+        'locality': _choice(rng, ['High Wycombe', 'Berlin', 'Boston', 'Leeds', 'Munich'], rows),
+        'store_code': [f'ST-{number:08X}' for number in rng.integers(0, 2**32, rows)],
+        'staff_numbers': staff_numbers,
+        'opening_date': _dates(rng, rows, '1990-01-01', '2022-12-31'),
+        'store_type': _choice(rng, ['Local', 'Super Store', 'Mall Kiosk', 'Outlet'], rows),
+        'latitude': rng.uniform(30, 60, rows).round(5).astype(str).astype(object),
+        'country_code': country_code,
+        'continent': continent,
+    })
+    stores.loc[0, ['address', 'longitude', 'locality', 'latitude', 'store_type']] = \
+        ['N/A', 'N/A', 'N/A', 'N/A', 'Web Portal']
+    stores.loc[0, 'store_code'] = 'WEB-1388012W'
+    null_rows = rng.random(rows) < 0.005
+    null_rows[0] = False
+    stores.loc[null_rows, stores.columns[1:]] = 'NULL'
+    junk_rows = (rng.random(rows) < 0.005) & ~null_rows
+    junk_rows[0] = False
+    for column in ['country_code', 'opening_date', 'store_type', 'continent']:
+        stores.loc[junk_rows, column] = _junk(rng)(junk_rows.sum())
+    return stores
+
+
+def make_products(rows, seed=0):
+    '''Returns a raw products DataFrame of the given number of rows.'''
+    rng = np.random.default_rng(seed)
+    weight = np.empty(rows, dtype=object)
+    weight_formats = rng.choice(5, size=rows, p=(0.5, 0.3, 0.1, 0.05, 0.05))
+    quantity = rng.integers(1, 2000, rows)
+    templates = ['{0}g', '{1}kg', '{0}ml', '{2} x {0}g', '{3}oz']
+    for number, template in enumerate(templates):
+        mask = weight_formats == number
+        weight[mask] = [template.format(q, q / 100, q % 12 + 1, q % 30 + 1) for q in quantity[mask]]
+    products = pd.DataFrame({
+        'Unnamed: 0': np.arange(rows),
+        'product_name': _choice(rng, ['FurReal Dazzlin Dimples', 'Tiffany Lamp', 'Kettle', 'Garden Hose'], rows),
+        'product_price': [f'£{price:.2f}' for price in rng.uniform(1, 500, rows)],
+        'weight': weight,
+        'category': _choice(rng, ['toys-and-games', 'sports-and-leisure', 'pets', 'homeware', 'health-and-beauty',
+                                  'food-and-drink', 'diy'], rows),
+        'EAN': rng.integers(10**12, 10**13, rows).astype(str),
+        'date_added': _dates(rng, rows, '2000-01-01', '2022-12-31'),
+        'uuid': _uuids(rng, rows),
+        'removed': _choice(rng, ['Still_avaliable', 'Removed'], rows, p=(0.9, 0.1)),
+        'product_code': [f'R7-{number:07d}b' for number in rng.integers(0, 10**7, rows)],
+    })
+    products.loc[rng.random(rows) < 0.002, 'product_price'] = np.nan
+    junk_rows = rng.random(rows) < 0.002
+    for column in ['weight', 'category', 'removed']:
+        products.loc[junk_rows, column] = _junk(rng)(junk_rows.sum())
+    return products
+
+
+def make_orders(rows, seed=0):
+    '''Returns a raw orders_table DataFrame of the given number of rows.'''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'level_0': np.arange(rows),
+        'index': np.arange(rows),
+        'date_uuid': _uuids(rng, rows),
+        'first_name': None,
+        'last_name': None,
+        'user_uuid': _uuids(rng, rows),
+        'card_number': rng.integers(10**11, 10**16, rows),
+        'store_code': [f'ST-{number:08X}' for number in rng.integers(0, 2**32, rows)],
+        'product_code': [f'R7-{number:07d}b' for number in rng.integers(0, 10**7, rows)],
+        '1': np.nan,
+        'product_quantity': rng.integers(1, 14, rows),
+    })
+
+
+def make_date_events(rows, seed=0):
+    '''Returns a raw date details DataFrame of the given number of rows.'''
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, 24 * 60 * 60, rows)
+    date_events = pd.DataFrame({
+        'timestamp': [f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in seconds],
+        'month': rng.integers(1, 13, rows).astype(str),
+        'year': rng.integers(1992, 2023, rows).astype(str),
+        'day': rng.integers(1, 29, rows).astype(str),
+        'time_period': _choice(rng, ['Evening', 'Morning', 'Midday', 'Late_Hours'], rows),
+        'date_uuid': _uuids(rng, rows),
+    })
+    null_rows = rng.random(rows) < 0.002
+    date_events.loc[null_rows] = 'NULL'
+    junk_rows = (rng.random(rows) < 0.002) & ~null_rows
+    for column in date_events.columns:
+        date_events.loc[junk_rows, column] = _junk(rng)(junk_rows.sum())
+    return date_events
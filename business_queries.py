@@ -0,0 +1,66 @@
+import argparse
+import re
+import pandas as pd
+from sqlalchemy import text
+from database_utils import DatabaseConnector
+
+QUERIES_FILE = 'business_queries.sql'
+# matches a '-- Task 1. Question?' heading and the query following it, up to its semicolon
+TASK_PATTERN = re.compile(r'^-- Task (?P<task>\d+)\. (?P<question>[^\n]*)\n(?P<query>.*?);', re.MULTILINE | re.DOTALL)
+
+def read_queries(filename=QUERIES_FILE):
+    '''Reads the business queries from a SQL file, in which each query follows a '-- Task N. Question' comment.
+
+    Parameters
+    ----------
+    filename: str
+        Name of SQL file containing the business queries.
+
+    Returns
+    -------
+    dict
+        Question and query of each task, keyed by task number.
+    '''
+    with open(filename, 'r') as file:
+        queries = file.read()
+    return {int(match['task']): (match['question'].strip(), match['query'].strip())
+            for match in TASK_PATTERN.finditer(queries)}
+
+def run_queries(connector, tasks=None, filename=QUERIES_FILE):
+    '''Runs the business queries against the local database, which read from the summaries refreshed by the summaries job.
+
+    Parameters
+    ----------
+    connector: DatabaseConnector
+        Connector for the local database.
+    tasks: iterable of int, optional
+        Numbers of the tasks to run. If None, every task is run.
+    filename: str
+        Name of SQL file containing the business queries.
+
+    Returns
+    -------
+    dict
+        Question and result, as a pandas DataFrame, of each task, keyed by task number.
+    '''
+    queries = read_queries(filename)
+    selected = sorted(queries) if tasks is None else list(tasks)
+    unknown = set(selected) - set(queries)
+    if unknown:
+        raise ValueError(f"Unknown tasks: {', '.join(map(str, sorted(unknown)))}")
+    results = {}
+    with connector.init_db_engine().connect() as connection:
+        for task in selected:
+            question, query = queries[task]
+            results[task] = (question, pd.read_sql_query(text(query), connection))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the business queries against the local database.')
+    parser.add_argument('--tasks', type=int, nargs='+', help='numbers of the tasks to run (default: all)')
+    parser.add_argument('--creds', default='local_creds.yaml', help='YAML file of local database credentials')
+    parser.add_argument('--file', default=QUERIES_FILE, help='SQL file of business queries')
+    args = parser.parse_args()
+    with DatabaseConnector(args.creds) as connector:
+        for task, (question, result) in run_queries(connector, args.tasks, args.file).items():
+            print(f'Task {task}. {question}\n{result.to_string(index=False)}\n')
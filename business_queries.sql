@@ -1,9 +1,11 @@
+-- The queries read from the materialized summaries in summary_views.sql, which are refreshed after each load, rather than
+-- joining the orders to the dimension tables every time they are run.
 
 -- Task 1. How many stores does the business have and in which countries?
 SELECT
-    country_code AS country, 
-    COUNT(store_code) AS total_no_stores
-FROM dim_store_details
+    country_code AS country,
+    SUM(total_no_stores)::BIGINT AS total_no_stores
+FROM store_counts
 WHERE country_code IN ('GB', 'DE', 'US')
 GROUP BY country_code
 ORDER BY total_no_stores DESC;
@@ -11,24 +13,20 @@ ORDER BY total_no_stores DESC;
 
 -- Task 2. Which locations currently have the most stores?
 SELECT
-    locality, 
-    COUNT(store_code) AS total_no_stores
-FROM dim_store_details
+    locality,
+    SUM(total_no_stores)::BIGINT AS total_no_stores
+FROM store_counts
 GROUP BY locality
-HAVING COUNT(store_code) >= 10
+HAVING SUM(total_no_stores) >= 10
 ORDER BY total_no_stores DESC;
 
 
 -- Task 3. Which months produce the average highest cost of sales typically?
 SELECT
-    ROUND(SUM(product_quantity * product_price)::numeric, 2) AS total_sales,
+    SUM(total_sales) AS total_sales,
     month
 FROM
-    orders_table AS ot
-INNER JOIN
-    dim_date_times AS ddt ON ot.date_uuid = ddt.date_uuid
-INNER JOIN
-    dim_products AS dp ON ot.product_code = dp.product_code
+    monthly_sales
 GROUP BY month
 ORDER BY total_sales DESC
 LIMIT 6;
@@ -36,38 +34,27 @@ LIMIT 6;
 
 -- Task 4. How many sales are coming from online?
 SELECT
-    COUNT(date_uuid) AS number_of_sales,
-    SUM(product_quantity) AS product_quantity_count,
+    SUM(number_of_sales)::BIGINT AS number_of_sales,
+    SUM(product_quantity)::BIGINT AS product_quantity_count,
     CASE store_type
         WHEN 'Web Portal' THEN 'Web'
         ELSE 'Offline'
     END AS location
 FROM
-    orders_table AS ot
-INNER JOIN
-    dim_store_details AS dst ON ot.store_code = dst.store_code
+    store_type_sales
 GROUP BY location
 ORDER BY number_of_sales;
 
 
 -- Task 5. What percentage of sales come through each type of store?
-WITH all_sales_by_store AS (
-    SELECT
-        store_type,
-        ROUND((product_price * product_quantity)::numeric, 2) AS sale
-    FROM
-        orders_table as ot
-    INNER JOIN
-        dim_store_details AS dst ON ot.store_code = dst.store_code
-    INNER JOIN
-        dim_products AS dp ON ot.product_code = dp.product_code
-)
 SELECT
     store_type,
-    SUM(sale) AS total_sales,
-    ROUND(SUM(sale) * 100 / SUM(SUM(sale)) OVER (), 2) AS "percentage_total(%)"
+    SUM(total_sales) AS total_sales,
+    ROUND(SUM(total_sales) * 100 / SUM(SUM(total_sales)) OVER (), 2) AS "percentage_total(%)"
 FROM
-    all_sales_by_store
+    store_type_sales
+WHERE
+    total_sales IS NOT NULL
 GROUP BY
     store_type
 ORDER BY
@@ -76,15 +63,11 @@ ORDER BY
 
 -- Task 6. Which month in each year produced the highest cost of sales?
 SELECT
-    ROUND(SUM(product_price * product_quantity)::numeric, 2) AS total_sales,
+    SUM(total_sales) AS total_sales,
     year,
     month
 FROM
-    orders_table as ot
-INNER JOIN
-    dim_date_times AS ddt ON ot.date_uuid = ddt.date_uuid
-INNER JOIN
-    dim_products AS dp ON ot.product_code = dp.product_code
+    monthly_sales
 GROUP BY
     year, month
 ORDER BY
@@ -94,10 +77,10 @@ LIMIT 10;
 
 -- Task 7. What is our staff headcount?
 SELECT
-    SUM(staff_numbers) AS total_staff_numbers,
+    SUM(total_staff_numbers)::BIGINT AS total_staff_numbers,
     country_code
 FROM
-    dim_store_details
+    store_counts
 WHERE
     country_code IN ('US', 'GB', 'DE')
 GROUP BY
@@ -108,17 +91,13 @@ ORDER BY
 
 -- Task 8. Which German store type is selling the most?
 SELECT
-    ROUND(SUM(product_price * product_quantity)::numeric, 2) AS total_sales,
+    SUM(total_sales) AS total_sales,
     store_type,
     country_code
 FROM
-    orders_table AS ot
-INNER JOIN
-    dim_store_details AS dst ON ot.store_code = dst.store_code
-INNER JOIN
-    dim_products AS dp ON ot.product_code = dp.product_code
+    store_type_sales
 WHERE
-    country_code = 'DE'
+    country_code = 'DE' AND total_sales IS NOT NULL
 GROUP BY
     country_code, store_type
 ORDER BY
@@ -126,31 +105,11 @@ ORDER BY
 
 
 -- Task 9. How quickly is the company making sales?
-WITH all_orders_by_time AS (
-SELECT
-    year,
-    TO_TIMESTAMP(year || '-' || month || '-' || day || ' ' || timestamp, 'YYYY-MM-DD HH24:MI:SS') AS timestamp
-FROM
-    orders_table AS ot
-INNER JOIN
-    dim_date_times AS ddt ON ot.date_uuid = ddt.date_uuid
-ORDER BY
-    timestamp
-), lead_table AS (
 SELECT
     year,
-    timestamp,
-    LEAD(timestamp) OVER (ORDER BY timestamp) AS next
+    actual_time_taken
 FROM
-    all_orders_by_time
-)
-SELECT
-    year,
-    AVG(next - timestamp) AS actual_time_taken
-FROM
-    lead_table
-GROUP BY
-    year
+    sale_intervals_by_year
 ORDER BY
     actual_time_taken DESC
-LIMIT 5;
\ No newline at end of file
+LIMIT 5;
@@ -1,11 +1,143 @@
+import functools
+import multiprocessing
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import re # for regular expressions
+import instrumentation
+from date_parsing import DateParser
+from extract_cache import arrow_compatible
+from instrumentation import instrumented
+
+# matches weights such as '1.6kg', '590g', '500ml', '16oz', '12 x 100g' and '77g .'
+WEIGHT_PATTERN = re.compile(r'^\s*(?:(?P<multiplier>\d+)\s*x\s*)?(?P<quantity>\d+(?:\.\d+)?)\s*(?P<unit>kg|g|ml|oz)\s*\.?\s*$')
+# kilograms per ounce or kilogram, and grams, or millilitres treated as grams, per kilogram; metric weights are divided
+# rather than multiplied by 0.001, which isn't exact in floating point, so that they keep the values they have always had
+KILOGRAMS_PER_UNIT = {'kg': 1.0, 'oz': 0.0283495}
+UNITS_PER_KILOGRAM = {'g': 1000.0, 'ml': 1000.0}
+# weight classes for the delivery team, each from its lower bound in kilograms up to the next
+WEIGHT_CLASSES = {'Light': 0.0, 'Mid_Sized': 2.0, 'Heavy': 40.0, 'Truck_Required': 140.0}
+
+# cleaning methods whose output is indexed by position in the frame they're given, so a chunk's output is offset by its start
+POSITIONALLY_INDEXED = {'clean_card_data'}
+
+def _clean_shared_chunk(method, name, size, collect):
+    '''Cleans a chunk of a DataFrame stored in shared memory as an Arrow IPC stream, returning the result as an IPC stream.
+
+    For use as a process pool task by DataCleaning.parallel_clean(). Only the name of the shared memory block is pickled to
+    the worker, and only the bytes of the result's Arrow buffers are pickled back, along with the number of dates parsed
+    with each format and, if collect is True, the worker's instrumentation record of the rows dropped and date formats.
+    '''
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        chunk = pa.ipc.open_stream(pa.py_buffer(block.buf[:size])).read_pandas()
+    finally:
+        block.close()
+    cleaner = DataCleaning()
+    # instrumentation isn't configured in the worker, so its counts are collected to be merged by the parent
+    if collect:
+        with instrumentation.collect() as record:
+            cleaned = getattr(cleaner, method)(chunk)
+    else:
+        cleaned, record = getattr(cleaner, method)(chunk), {}
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(arrow_compatible(cleaned), preserve_index=True)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes(), cleaner.date_parser.counts, record
+
+def _to_shared_memory(dataframe):
+    '''Writes a DataFrame to a new block of shared memory as an Arrow IPC stream, returning the block and the stream's size.'''
+    table = pa.Table.from_pandas(arrow_compatible(dataframe), preserve_index=True)
+    # measure the stream first, so the block can be allocated at its exact size and written in place
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    block = shared_memory.SharedMemory(create=True, size=max(sink.size(), 1))
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(block.buf)), table.schema) as writer:
+        writer.write_table(table)
+    return block, sink.size()
+
+def clean_pool(n_workers=None):
+    '''Returns a pool of n_workers processes for parallel_clean(), which can be reused for every chunk of a streamed table.
+
+    The processes are spawned rather than forked, as the pipeline cleans from job threads, and forking a process that has
+    other threads running can deadlock it.
+    '''
+    return ProcessPoolExecutor(max_workers=n_workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+
+def _concat_chunks(chunks):
+    '''Concatenates cleaned chunks in order, combining the categories of categorical columns rather than losing the dtype.'''
+    categorical = [column for column, dtype in chunks[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    combined = pd.concat(chunks)
+    for column in categorical:
+        combined[column] = pd.Categorical(combined[column],
+                                          categories=pd.api.types.union_categoricals([chunk[column] for chunk in chunks]).categories)
+    return combined
+
+def _valid_rows(**rules):
+    '''Combines named boolean masks of the rows passing each cleaning rule into a single mask of the rows to keep.
+
+    When dropped rows are being counted, each dropped row is counted against the first rule it fails and the counts are added to
+    the current stage's record.
+    '''
+    valid = functools.reduce(operator.and_, rules.values())
+    if instrumentation.counting():
+        remaining = pd.Series(True, index=valid.index)
+        for rule, passed in rules.items():
+            instrumentation.record_dropped(rule, int((remaining & ~passed).sum()))
+            remaining &= passed
+    return valid
+
+def _categorise(dataframe, columns):
+    '''Converts low-cardinality string columns of a DataFrame to the categorical dtype, in place, returning the DataFrame.'''
+    for column in columns:
+        dataframe[column] = dataframe[column].astype('category')
+    return dataframe
+
+def memory_report(before, after):
+    '''Returns the bytes used by a DataFrame before and after cleaning, counting the contents of strings.
+
+    Parameters
+    ----------
+    before: pandas.core.frame.DataFrame
+        pandas DataFrame as extracted
+    after: pandas.core.frame.DataFrame
+        pandas DataFrame as cleaned
+
+    Returns
+    -------
+    dict
+        Bytes used before and after cleaning, and bytes used after cleaning by each column.
+    '''
+    return {'bytes_before': int(before.memory_usage(deep=True).sum()),
+            'bytes_after': int(after.memory_usage(deep=True).sum()),
+            'column_bytes_after': {str(column): int(size) for column, size
+                                   in after.memory_usage(deep=True, index=False).items()}}
 
 class DataCleaning:
     '''This class contains methods for cleaning data from various sources
+
+    Each method drops invalid rows with a single combined mask rather than one drop per rule, stores low-cardinality text
+    columns such as country codes, store types and card providers as categoricals and downcasts integer columns to the
+    smallest type that holds them, which keeps cleaned tables small while they wait to be uploaded. Every column is given
+    the type it is declared with in table_schemas.py, so the cleaned tables are loaded as they are, without being altered
+    afterwards. Date columns are parsed with a DateParser, which tries the formats known to occur in the sources before
+    inferring the format of what's left.
+
+    Attributes
+    ----------
+    date_parser:
+        This is the DateParser every date column is converted with, which counts the values parsed with each format.
     
     Methods
     -------
+    __init__(self, date_parser):
+        Initialises an instance of the DataCleaning class.
     clean_user_data(self, dataframe):
         Cleans DataFrame containing business user data.
     clean_card_data(self, dataframe):
@@ -13,14 +145,27 @@ class DataCleaning:
     clean_store_data(self, dataframe):
         Cleans DataFrame containing details of each of the business' stores
     convert_product_weights(self, dataframe):
-        Converts values in weight column of DataFrame to kilograms and to type floating point number
+        Converts values in weight column of DataFrame to kilograms and to type floating point number, flagging unparseable values
     clean_products_data(self, dataframe):
         Cleans DataFrame containing information about all products sold by the business.
     clean_orders_data(self, dataframe):
         Cleans main orders DataFrame.
     clean_date_events(self, dataframe):
         Cleans DataFrame containing date events data for all orders received by the business.
+    parallel_clean(self, method, dataframe, n_workers=None, chunk_rows=100000, executor=None):
+        Cleans a DataFrame in chunks across a pool of processes with one of the other methods, returning the chunks in order.
     '''
+    def __init__(self, date_parser=None):
+        '''Initialises an instance of the DataCleaning class.
+
+        Parameters
+        ----------
+        date_parser: DateParser, optional
+            DateParser to convert date columns with. If None, one trying the default formats is created.
+        '''
+        self.date_parser = date_parser or DateParser()
+
+    @instrumented
     def clean_user_data(self, dataframe):
         '''Cleans DataFrame containing business user data.
 
@@ -37,31 +182,31 @@ class DataCleaning:
         users: pandas.core.frame.DataFrame
             Cleaned pandas DataFrame
         '''
-        users = dataframe
-        # drop redundant index column
-        users.drop('index', axis=1, inplace=True)
-        # drop rows that contain 'NULL' strings
-        users.drop(users[users.first_name == 'NULL'].index, inplace=True)
-        # drop rows where unique user id is not standard 36 characters in length
-        users.drop(users[users['user_uuid'].str.len() != 36].index, inplace=True)
+        # keep rows that don't contain 'NULL' strings and where unique user id is standard 36 characters in length
+        valid = _valid_rows(null_first_name=dataframe.first_name != 'NULL',
+                            bad_user_uuid=dataframe['user_uuid'].str.len() == 36)
+        # drop invalid rows and redundant index column
+        users = dataframe.loc[valid].drop('index', axis=1)
         # remove line breaks from addresses
         users['address'] = users['address'].str.replace('\n', ' ')
         # convert date of birth column to datetime type
-        users['date_of_birth'] = pd.to_datetime(users['date_of_birth'])
+        users['date_of_birth'] = self.date_parser.parse(users['date_of_birth'])
         # convert join date column to datetime type
-        users['join_date'] = pd.to_datetime(users['join_date'])
+        users['join_date'] = self.date_parser.parse(users['join_date'])
         # correct 'GGB' values in country code column
-        users['country_code'] = users['country_code'].apply(lambda x: 'GB' if x == 'GGB' else x)
-        # remove country codes and/or extensions from phone numbers
-        users['phone_number'] = users['phone_number'].str.replace('\+1|\+44|\+49|x\w+', '', regex=True)
-        # remove non-numeric characters from phone numbers
-        users['phone_number'] = users['phone_number'].str.replace('\D+', '', regex=True)
+        users['country_code'] = users['country_code'].replace('GGB', 'GB')
+        country_code = users['country_code']
+        # remove country codes and/or extensions, then non-numeric characters, from phone numbers
+        phone_number = users['phone_number'].str.replace(r'\+1|\+44|\+49|x\w+', '', regex=True) \
+                                            .str.replace(r'\D+', '', regex=True)
         # strip remaining country codes from US numbers
-        users['phone_number'] = users.apply(lambda x: x['phone_number'][-10:] if x['country_code'] == 'US' else x['phone_number'], axis=1)
+        phone_number = phone_number.where(country_code != 'US', phone_number.str[-10:])
         # add missing preceding '0' to GB numbers
-        users['phone_number'] = users.apply(lambda x: '0' + x['phone_number'] if x['country_code'] == 'GB' and x['phone_number'][0] != '0' else x['phone_number'], axis=1)
-        return users
+        missing_zero = (country_code == 'GB') & (phone_number.str[:1] != '0')
+        users['phone_number'] = np.where(missing_zero, '0' + phone_number, phone_number)
+        return _categorise(users, ['country', 'country_code'])
 
+    @instrumented
     def clean_card_data(self, dataframe):
         '''Cleans DataFrame containing credit card data from business transactions.
         
@@ -77,21 +222,19 @@ class DataCleaning:
         users: pandas.core.frame.DataFrame
             Cleaned pandas DataFrame
         '''
-        cards = dataframe
-        # reset index
-        cards.reset_index(inplace=True, drop=True)
-        # drop rows that contain 'NULL' strings
-        cards.drop(cards[cards.card_number == 'NULL'].index, inplace=True)
-        # drop rows where expiry date is not standard 5 characters in length
-        cards.drop(cards[cards['expiry_date'].str.len() != 5].index, inplace=True)
-        # cast card numbers as strings
-        cards['card_number'] = cards['card_number'].astype(str)
-        # remove question marks from card numbers
-        cards['card_number'] = cards['card_number'].str.replace('\D+', '', regex=True)
+        # reset index, as each page of the .pdf file is indexed from 0
+        cards = dataframe.reset_index(drop=True)
+        # keep rows that don't contain 'NULL' strings and where expiry date is standard 5 characters in length
+        valid = _valid_rows(null_card_number=cards.card_number != 'NULL',
+                            bad_expiry_date=cards['expiry_date'].str.len() == 5)
+        cards = cards.loc[valid]
+        # cast card numbers as strings and remove question marks from them
+        cards['card_number'] = cards['card_number'].astype(str).str.replace(r'\D+', '', regex=True)
         # convert date payment confirmed column to datetime type
-        cards['date_payment_confirmed'] = pd.to_datetime(cards['date_payment_confirmed'])
-        return cards
+        cards['date_payment_confirmed'] = self.date_parser.parse(cards['date_payment_confirmed'])
+        return _categorise(cards, ['card_provider'])
     
+    @instrumented
     def clean_store_data(self, dataframe):
         '''Cleans DataFrame containing details of each of the business' stores.
         
@@ -108,64 +251,63 @@ class DataCleaning:
         users: pandas.core.frame.DataFrame
             Cleaned pandas DataFrame
         '''
-        stores = dataframe
-        # drop redundant index and lat columns
-        stores.drop(['index', 'lat'], axis=1, inplace=True)
-        # drop rows that contain 'NULL' strings
-        stores.drop(stores[stores.country_code == 'NULL'].index, inplace=True)
-        # drop rows where country code is not standard 2 characters in length
-        stores.drop(stores[stores['country_code'].str.len() != 2].index, inplace=True)
+        # keep rows that don't contain 'NULL' strings and where country code is standard 2 characters in length
+        valid = _valid_rows(null_country_code=dataframe.country_code != 'NULL',
+                            bad_country_code=dataframe['country_code'].str.len() == 2)
+        # drop invalid rows and redundant index and lat columns
+        stores = dataframe.loc[valid].drop(['index', 'lat'], axis=1)
         # convert opening date column to datetime type
-        stores['opening_date'] = pd.to_datetime(stores['opening_date'])
+        stores['opening_date'] = self.date_parser.parse(stores['opening_date'])
+        # the web portal store is the first row of the store data, which may be absent from a chunk of it
+        web_portal = stores.index == 0
         # change N/A longitude value for web portal store
-        stores.loc[[0], ['longitude']] = pd.NA
+        stores.loc[web_portal, 'longitude'] = pd.NA
         # change location values for web portal store
-        stores.loc[[0], ['country_code', 'continent']] = 'N/A'
+        stores.loc[web_portal, ['country_code', 'continent']] = 'N/A'
         # clean incorrect values in continent column
-        stores['continent'] = stores['continent'].apply(lambda x: x[2:] if x[:2] == 'ee' else x)
-        # clean text from staff_numbers column
-        stores['staff_numbers'] = stores['staff_numbers'].str.replace('[^0-9]', '', regex=True)
-        return stores
+        stores['continent'] = stores['continent'].str.replace('^ee', '', regex=True)
+        # store coordinates as numbers, leaving the web portal store's 'N/A' values null
+        stores['longitude'] = pd.to_numeric(stores['longitude'], errors='coerce')
+        stores['latitude'] = pd.to_numeric(stores['latitude'], errors='coerce')
+        # clean text from staff_numbers column and store it as the smallest integer type that fits
+        stores['staff_numbers'] = pd.to_numeric(stores['staff_numbers'].str.replace('[^0-9]', '', regex=True),
+                                                downcast='integer')
+        return _categorise(stores, ['store_type', 'country_code', 'continent'])
 
     def convert_product_weights(self, dataframe):
-        '''Converts values in weight column of DataFrame to kilograms and to type floating point number.
+        '''Converts values in weight column of DataFrame to kilograms and to type floating point number, flagging unparseable values.
         
-        Takes a DataFrame of products and utilises an internal method to strip weights of unit strings and convert weights to
-        floats before returning the DataFrame with converted weights. 
+        Takes a DataFrame of products and extracts the multiplier, quantity and unit of every weight with a single regular
+        expression, then converts them to kilograms, dividing grams and millilitres by 1000. Weights that don't match are set
+        to NaN and their original text is kept in a 'rejected_weight' column, which is <NA> for every weight that was
+        converted. The given DataFrame is left unchanged.
         
-         Parameters
+        Parameters
         ----------
         dataframe: pandas.core.frame.DataFrame
             pandas DataFrame containing product information, including 'weight' column
         
         Returns
         -------
-        users: pandas.core.frame.DataFrame
-            pandas DataFrame with cleaned 'weight column'
+        products: pandas.core.frame.DataFrame
+            pandas DataFrame with float 'weight' column in kilograms and string 'rejected_weight' column
         '''
-        products = dataframe
-        def strip_and_convert_to_float(weight: str):
-            '''Method to strip unit strings, convert to float data type, and convert to kilograms.'''
-            if weight[-2:] == 'kg':
-                return float(weight[:-2])
-            elif weight.find(' x ') != -1:
-                return eval(weight.replace(' x ', '*')[:-1]) / 1000
-            elif weight[-1] == 'g' or weight[-2:] == 'ml' or weight.find('.') != -1:
-                return float(re.sub('[^0-9]', '', weight)) / 1000
-            elif weight[-2:] == 'oz':
-                return float(weight[:-2]) * 0.0283495
-            else:
-                return weight
-        # apply strip_and_convert_to_float() method to dataframe 'weight' column
-        products['weight'] = products['weight'].apply(strip_and_convert_to_float)
-        return products
+        parts = dataframe['weight'].astype(str).str.extract(WEIGHT_PATTERN)
+        # multiply quantity by multiplier, where there is one, then convert it to kilograms
+        amount = parts['quantity'].astype(float) * parts['multiplier'].astype(float).fillna(1)
+        kilograms = amount * parts['unit'].map(KILOGRAMS_PER_UNIT).fillna(1) / parts['unit'].map(UNITS_PER_KILOGRAM).fillna(1)
+        # keep the text of weights that couldn't be parsed
+        rejected = dataframe['weight'].where(kilograms.isna()).astype('string')
+        return dataframe.assign(weight=kilograms, rejected_weight=rejected)
     
+    @instrumented
     def clean_products_data(self, dataframe):
         '''Cleans DataFrame containing information about all products sold by the business.
         
         Takes a DataFrame containing information about the products sold by the business, utilises the convert_product_weights()
-        method to convert all weights to kilograms, cleans null or incorrect values and drops redundant columns before returning
-        cleaned DataFrame.
+        method to convert all weights to kilograms, cleans null or incorrect values and drops redundant columns. Prices are
+        converted to numbers, the removed column is replaced by a still_available boolean and each product is given the
+        weight_class the delivery team uses, before returning cleaned DataFrame.
         
         Parameters
         ----------
@@ -177,19 +319,26 @@ class DataCleaning:
         users: pandas.core.frame.DataFrame
             Cleaned pandas DataFrame
         '''
-        products = dataframe
-        # drop rows with null values
-        products.dropna(inplace=True)
+        # keep rows without null values
+        complete = dataframe.notna().all(axis=1)
         # convert product weights to kilogram floats
-        self.convert_product_weights(products)
-        # drop rows where weights are strings
-        products.drop(products[products['weight'].apply(lambda x: isinstance(x, str))].index, inplace=True)
-        # drop redundant index column
-        products.drop('Unnamed: 0', axis=1, inplace=True)
+        products = self.convert_product_weights(dataframe)
+        # drop incomplete rows and rows where weights couldn't be parsed, and the redundant index and rejected weight columns
+        valid = _valid_rows(missing_values=complete, bad_weight=products['rejected_weight'].isna())
+        products = products.loc[valid].drop(['Unnamed: 0', 'rejected_weight'], axis=1)
         # convert date_added column to datetime type
-        products['date_added'] = pd.to_datetime(products['date_added'])
-        return products
+        products['date_added'] = self.date_parser.parse(products['date_added'])
+        # strip the pound sign from prices and store them as numbers
+        products['product_price'] = products['product_price'].str.lstrip('£').astype(float)
+        # replace the misspelt removed column with a boolean of whether the product is still available
+        products['removed'] = (products['removed'] == 'Still_avaliable').astype(bool)
+        products = products.rename(columns={'removed': 'still_available'})
+        # classify each product by weight, each class starting at its lower bound
+        products['weight_class'] = pd.cut(products['weight'], bins=list(WEIGHT_CLASSES.values()) + [np.inf], right=False,
+                                          labels=list(WEIGHT_CLASSES))
+        return _categorise(products, ['category'])
     
+    @instrumented
     def clean_orders_data(self, dataframe):
         '''Cleans main orders DataFrame.
         
@@ -205,11 +354,13 @@ class DataCleaning:
         users: pandas.core.frame.DataFrame
             Cleaned pandas DataFrame
         '''
-        orders = dataframe
         # drop redundant columns
-        orders.drop(['level_0', 'index', 'first_name', 'last_name', '1'], axis=1, inplace=True)
+        orders = dataframe.drop(['level_0', 'index', 'first_name', 'last_name', '1'], axis=1)
+        # store product quantities as the smallest integer type that fits
+        orders['product_quantity'] = pd.to_numeric(orders['product_quantity'], downcast='integer')
         return orders
     
+    @instrumented
     def clean_date_events(self, dataframe):
         '''Cleans DataFrame containing date events data for all orders received by the business.
         
@@ -226,9 +377,78 @@ class DataCleaning:
         users: pandas.core.frame.DataFrame
             Cleaned pandas DataFrame
         '''
-        date_events = dataframe
-        # drop rows that contain 'NULL' strings
-        date_events.drop(date_events[date_events.timestamp == 'NULL'].index, inplace=True)
-        # drop rows where date uuid is not standard 36 characters in length
-        date_events.drop(date_events[date_events['date_uuid'].str.len() != 36].index, inplace=True)
-        return date_events
\ No newline at end of file
+        # keep rows that don't contain 'NULL' strings and where date uuid is standard 36 characters in length
+        valid = _valid_rows(null_timestamp=dataframe.timestamp != 'NULL',
+                            bad_date_uuid=dataframe['date_uuid'].str.len() == 36)
+        categories = dict.fromkeys(['month', 'year', 'day', 'time_period'], 'category')
+        return dataframe.loc[valid].astype(categories)
+
+    @instrumented
+    def parallel_clean(self, method, dataframe, n_workers=None, chunk_rows=100000, executor=None):
+        '''Cleans a DataFrame in chunks across a pool of processes with one of the other methods, returning the chunks in order.
+        
+        Every cleaning method works row by row, so a large DataFrame can be split into chunks of chunk_rows rows and each
+        chunk cleaned on a different core. Each chunk is written to a block of shared memory as an Arrow IPC stream, which
+        the worker process reads without it being pickled, and the cleaned chunk is sent back as an Arrow IPC stream. Columns
+        mixing strings and numbers are sent as strings, as in the extract cache. The chunks keep their index, so the web
+        portal store, which is labelled 0, is still recognised in its chunk, and the positional index given to card data is
+        offset by the start of each chunk, so the result matches cleaning the whole DataFrame at once. The number of dates
+        each worker parsed with each format, and the rows it dropped, are sent back with its chunk and added to date_parser
+        and the current stage's record, as if the chunk had been cleaned here.
+        
+        Parameters
+        ----------
+        method: str
+            Name of cleaning method, such as 'clean_user_data'.
+        dataframe: pandas.core.frame.DataFrame
+            pandas DataFrame to be cleaned
+        n_workers: int, optional
+            Number of processes. If None, the number of CPUs is used. With one process, or a DataFrame of no more than
+            chunk_rows rows, the DataFrame is cleaned in this process.
+        chunk_rows: int
+            Number of rows per chunk.
+        executor: concurrent.futures.ProcessPoolExecutor, optional
+            Pool from clean_pool() to clean the chunks in, so that its processes, which are slow to start, serve every chunk
+            of a streamed table. If None, a pool of n_workers processes is started for this DataFrame alone.
+        
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+            Cleaned pandas DataFrame
+        '''
+        n_workers = n_workers or os.cpu_count()
+        if n_workers == 1 or len(dataframe) <= chunk_rows:
+            return getattr(self, method)(dataframe)
+        starts = range(0, len(dataframe), chunk_rows)
+        blocks = []
+        futures = []
+        owned = executor is None
+        if owned:
+            executor = clean_pool(n_workers)
+        try:
+            for start in starts:
+                block, size = _to_shared_memory(dataframe.iloc[start:start + chunk_rows])
+                blocks.append(block)
+                futures.append(executor.submit(_clean_shared_chunk, method, block.name, size, instrumentation.enabled()))
+            chunks = []
+            # collect the chunks in order, whichever finishes first
+            for start, future in zip(starts, futures):
+                result, date_counts, record = future.result()
+                chunk = pa.ipc.open_stream(result).read_pandas()
+                self.date_parser.add_counts(date_counts)
+                instrumentation.merge(record)
+                if method in POSITIONALLY_INDEXED:
+                    chunk.index = chunk.index + start
+                chunks.append(chunk)
+        finally:
+            # no worker may still be reading a block when it is removed
+            if owned:
+                executor.shutdown(cancel_futures=True)
+            else:
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return _concat_chunks(chunks)
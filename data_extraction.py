@@ -1,10 +1,151 @@
+import io
+import json
+import math
+import multiprocessing
 import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
-import requests # for making GET requests to api
-import tabula # for reading tabular data from .pdf
-from dotenv import load_dotenv # for storing api key in .env file
+import pyarrow as pa
+from sqlalchemy import text
+from instrumentation import instrumented
+# the libraries each source needs, such as tabula and its Java bridge for the .pdf file, requests for the api and fsspec for
+# S3 storage, are imported by the functions using them, so that a job extracting from one source doesn't load the others
 
-load_dotenv()  # take environment variables from .env.
+# number of rows in each chunk streamed from a file
+FILE_CHUNKSIZE = 100000
+# number of bytes read from a remote file, and parsed by pyarrow, at a time
+FILE_BLOCK_SIZE = 2**22
+# compression of files by suffix, then by the magic number they start with, as pyarrow codec names
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd', '.bz2': 'bz2'}
+COMPRESSION_MAGIC = {b'\x1f\x8b': 'gzip', b'\x28\xb5\x2f\xfd': 'zstd', b'BZh': 'bz2'}
+# format of files by suffix, once any compression suffix is removed
+FORMAT_SUFFIXES = {'.csv': 'csv', '.json': 'json', '.jsonl': 'ndjson', '.ndjson': 'ndjson', '.parquet': 'parquet',
+                   '.pq': 'parquet'}
+
+class RateLimiter:
+    '''Thread-safe limiter that spaces calls evenly so that no more than a given number are started per second.
+
+    Methods
+    -------
+    __init__(self, requests_per_second):
+        Initialises an instance of the RateLimiter class.
+    wait(self):
+        Blocks until the next call is allowed to start.
+    '''
+    def __init__(self, requests_per_second=None):
+        '''Initialises an instance of the RateLimiter class.
+
+        Parameters
+        ----------
+        requests_per_second: float, optional
+            Maximum number of calls started per second. None or 0 disables rate limiting.
+        '''
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        '''Blocks until the next call is allowed to start.'''
+        if not self.interval:
+            return
+        # reserve the next free slot while holding the lock, then sleep outside it
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _read_pdf_pages(path, first_page, last_page):
+    '''Reads the tables on a range of pages of a local .pdf file, returning them with the seconds taken, for use as a process pool task.'''
+    import tabula # for reading tabular data from .pdf
+    start = time.perf_counter()
+    frames = tabula.read_pdf(path, pages=f'{first_page}-{last_page}')
+    return frames, time.perf_counter() - start
+
+def _format_from_suffixes(endpoint):
+    '''Returns the compression and format of a file from its suffixes, either of which is None if they don't say.'''
+    root, suffix = os.path.splitext(endpoint.split('?')[0].lower())
+    compression = COMPRESSION_SUFFIXES.get(suffix)
+    if compression is not None:
+        root, suffix = os.path.splitext(root)
+    return compression, FORMAT_SUFFIXES.get(suffix)
+
+def _sniff_text_format(head):
+    '''Returns the format of a text file from its first bytes: 'ndjson' if it holds one object per line, 'json' if it holds a
+    single document, otherwise 'csv'.'''
+    text = head.decode('utf-8', errors='ignore').lstrip()
+    if text[:1] == '[':
+        return 'json'
+    if text[:1] != '{':
+        return 'csv'
+    first_line, _, rest = text.partition('\n')
+    try:
+        json.loads(first_line)
+    except ValueError:
+        return 'json'
+    # a single line could be either, but only newline-delimited files continue with another object
+    return 'ndjson' if rest.lstrip()[:1] == '{' else 'json'
+
+def _read_text_chunks(stream, file_format, chunksize, dtypes):
+    '''Yields the table in a decompressed .csv or .json stream as DataFrame chunks, sniffing its format if it isn't known.'''
+    file_format = file_format or _sniff_text_format(stream.peek(FILE_BLOCK_SIZE))
+    if file_format == 'csv':
+        yield from _index_chunks(_read_csv_chunks(stream, chunksize, dtypes))
+    elif file_format == 'ndjson':
+        yield from pd.read_json(io.TextIOWrapper(stream, encoding='utf-8'), lines=True, chunksize=chunksize,
+                                dtype=_pandas_dtypes(dtypes))
+    else:
+        # a document of columns or records can only be parsed whole
+        data = pd.read_json(io.TextIOWrapper(stream, encoding='utf-8'), dtype=_pandas_dtypes(dtypes))
+        for start in range(0, max(len(data), 1), chunksize):
+            yield data.iloc[start:start + chunksize]
+
+def _pandas_dtypes(dtypes):
+    '''Returns pyarrow type names as the pandas dtypes of the same columns, or True to let pandas infer every dtype.'''
+    if not dtypes:
+        return True
+    return {column: pa.type_for_alias(name).to_pandas_dtype() for column, name in dtypes.items()}
+
+def _read_csv_chunks(stream, chunksize, dtypes):
+    '''Yields the rows of a .csv file as DataFrames of chunksize rows, as pyarrow's streaming reader parses them.'''
+    import pyarrow.csv as pa_csv # for streaming .csv files
+    convert_options = pa_csv.ConvertOptions(
+        column_types={column: pa.type_for_alias(name) for column, name in (dtypes or {}).items()},
+        # treat empty and 'NULL' strings as missing, as pandas does
+        strings_can_be_null=True)
+    reader = pa_csv.open_csv(stream, read_options=pa_csv.ReadOptions(block_size=FILE_BLOCK_SIZE),
+                             convert_options=convert_options)
+    # name unnamed columns, such as a saved index, and number repeated names as pandas does
+    names, seen = [], {}
+    for number, name in enumerate(reader.schema.names):
+        name = name or f'Unnamed: {number}'
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f'{name}.{count}' if count else name)
+    batches, rows, yielded = [], 0, False
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        while rows >= chunksize:
+            table = pa.Table.from_batches(batches, schema=reader.schema)
+            yield table.slice(0, chunksize).rename_columns(names).to_pandas()
+            batches, rows, yielded = table.slice(chunksize).to_batches(), rows - chunksize, True
+    # the rows left over, or an empty DataFrame of the file's columns if it has no rows
+    if rows or not yielded:
+        yield pa.Table.from_batches(batches, schema=reader.schema).rename_columns(names).to_pandas()
+
+def _index_chunks(chunks):
+    '''Yields DataFrame chunks reindexed consecutively from 0 across all of them.'''
+    offset = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
 
 class DataExtractor:
     ''' This class contains methods for extracting data from various sources.
@@ -17,33 +158,133 @@ class DataExtractor:
         This is the api endpoint for retrieving any given store, by appending the store number to the endpoint path.
     api_header:
         This is the dictionary that contains the api key for accessing the store api endpoints
+    max_workers:
+        This is the number of store records requested concurrently by retrieve_stores_data().
+    max_retries:
+        This is the number of times a failed store request is retried before giving up.
+    backoff_factor:
+        This is the base delay in seconds between retries, doubled after each failed attempt.
+    requests_per_second:
+        This is the maximum rate at which store requests are started, or None for no limit.
+    timeout:
+        This is the number of seconds an http request waits to connect, or for the server to send data, before failing.
+    cache:
+        This is the ExtractCache raw extracts are stored in and reused from, or None to always extract from the source.
+    pdf_workers:
+        This is the number of processes reading ranges of .pdf pages in parallel.
+    pdf_pages_per_task:
+        This is the number of .pdf pages read by each process pool task, or None to give each worker one range.
     
     Methods
     -------
-    __init__(self):
+    __init__(self, max_workers=16, max_retries=3, backoff_factor=0.5, requests_per_second=None, cache=None,
+             pdf_workers=None, pdf_pages_per_task=None, timeout=30):
         Initialises an instance of the DataExtractor class with the attributes listed.
-    read_rds_table(self, connector, table):
-        Reads SQL table from RDS database and returns table as pandas DataFrame.
-    retrieve_pdf_data(self, connector, table):
+    read_rds_table(self, connector, table, chunksize=None, watermark_column=None, watermark=None):
+        Reads SQL table, or its rows beyond a watermark, from RDS database as pandas DataFrame or iterator of chunks.
+    retrieve_pdf_data(self, link, progress=None):
         Retrieves tabular data from cloud-based .pdf file and returns data as pandas DataFrame.
+    iter_pdf_pages(self, link, progress=None):
+        Downloads a .pdf file once and yields the tables on its pages in page order, reading ranges of pages in parallel.
     list_number_of_stores(self):
         Retrieves number of stores from api endpoint.
+    retrieve_store(self, store_number, rate_limiter=None):
+        Retrieves a single store record from the api, retrying failed requests with exponential backoff.
     retrieve_stores_data(self):
-        Iteratively retrieves individual store records and adds them to pandas DataFrame.
-    extract_from_S3(self, endpoint):
-        Retrieves data from .json or .csv file stored in AWS S3.
+        Concurrently retrieves individual store records and collects them into a pandas DataFrame.
+    extract_from_s3(self, endpoint, watermark=None, chunksize=None, dtypes=None):
+        Retrieves data, or its rows beyond a watermark, from a .csv, .json, newline-delimited .json or .parquet file stored in AWS S3.
+    stream_file(self, endpoint, chunksize=FILE_CHUNKSIZE, dtypes=None):
+        Yields the table in a .csv, .json, newline-delimited .json or .parquet file as pandas DataFrame chunks.
     '''
-    def __init__(self):
-        '''Initialises an instance of the DataExtractor class.'''
+    def __init__(self, max_workers=16, max_retries=3, backoff_factor=0.5, requests_per_second=None, cache=None,
+                 pdf_workers=None, pdf_pages_per_task=None, timeout=30):
+        '''Initialises an instance of the DataExtractor class.
+
+        Parameters
+        ----------
+        max_workers: int
+            Number of store records requested concurrently.
+        max_retries: int
+            Number of times a failed store request is retried.
+        backoff_factor: float
+            Base delay in seconds between retries.
+        requests_per_second: float, optional
+            Maximum rate at which store requests are started. None disables rate limiting.
+        cache: ExtractCache, optional
+            Cache to store raw extracts in and reuse them from.
+        pdf_workers: int, optional
+            Number of processes reading .pdf pages in parallel. If None, the number of CPUs is used.
+        pdf_pages_per_task: int, optional
+            Number of .pdf pages read by each task. If None, the pages are split evenly into one task per
+            worker, as each task starts its own Java virtual machine.
+        timeout: float
+            Seconds an http request waits to connect, or between bytes received, before failing.
+        '''
         self.number_of_stores_endpoint = 'https://aqj7u5id95.execute-api.eu-west-1.amazonaws.com/prod/number_stores'
         self.get_store_endpoint = 'https://aqj7u5id95.execute-api.eu-west-1.amazonaws.com/prod/store_details/'
+        from dotenv import load_dotenv # for storing api key in .env file
+        load_dotenv()  # take environment variables from .env.
         self.api_header = {'x-api-key': os.getenv("API_HEADER")}
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.requests_per_second = requests_per_second
+        self.cache = cache
+        self.pdf_workers = pdf_workers or os.cpu_count()
+        self.pdf_pages_per_task = pdf_pages_per_task
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self, api=True):
+        '''Returns a requests Session for the current thread, keeping its connections alive between calls.
+
+        Only the session for the store api sends the api key. Files are fetched with a separate session without it, so that
+        the key isn't sent to the hosts storing them.
+        '''
+        import requests # for making GET requests to api
+        from requests.adapters import HTTPAdapter
+        name = 'api_session' if api else 'file_session'
+        session = getattr(self._local, name, None)
+        if session is None:
+            session = requests.Session()
+            if api:
+                session.headers.update(self.api_header)
+            # one pooled connection per worker is enough, as each thread owns its session
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            setattr(self._local, name, session)
+        return session
 
-    def read_rds_table(self, connector, table):
-        '''Reads SQL table from RDS database and returns table as pandas DataFrame.
+    def _cached(self, source, fingerprint, extract):
+        '''Returns extract() through the cache, if there is one, keyed by source and the result of fingerprint().'''
+        if self.cache is None:
+            return extract()
+        return self.cache.fetch(source, fingerprint, extract)
+
+    def _file_fingerprint(self, url):
+        '''Returns a string identifying the current version of a remote file, from its ETag, Last-Modified date and size.'''
+        if url.startswith(('http://', 'https://')):
+            response = self._session(api=False).head(url, allow_redirects=True, timeout=self.timeout)
+            # an error response carries none of the headers, so would fingerprint every version of the file the same
+            response.raise_for_status()
+            headers = response.headers
+            return '|'.join(headers.get(name, '') for name in ('ETag', 'Last-Modified', 'Content-Length'))
+        import fsspec # for fingerprinting files in S3 storage
+        filesystem, path = fsspec.core.url_to_fs(url)
+        info = filesystem.info(path)
+        return '|'.join(str(info.get(name, '')) for name in ('ETag', 'LastModified', 'mtime', 'size'))
+
+    @instrumented
+    def read_rds_table(self, connector, table, chunksize=None, watermark_column=None, watermark=None):
+        '''Reads SQL table, or its rows beyond a watermark, from RDS database as pandas DataFrame or iterator of chunks.
         
         Takes an instance of the DatabaseConnector class and a table name, initialises a connection to a SQL database
-        and returns a pandas DataFrame containing the data from the table name passed in as an argument.
+        and returns a pandas DataFrame containing the data from the table name passed in as an argument. If a chunksize is
+        given, the table is instead streamed through a server-side cursor and returned as an iterator of DataFrames of at
+        most chunksize rows, so that the full table is never held in memory. If a watermark is given, only the rows whose
+        watermark_column is greater than the watermark are read, for incremental loads.
         
         Parameters
         ----------
@@ -51,39 +292,138 @@ class DataExtractor:
             Instance of DatabaseConnector class
         table: str
             Name of table to be retreived from RDS database
+        chunksize: int, optional
+            Number of rows per DataFrame chunk. If None, the whole table is read at once.
+        watermark_column: str, optional
+            Name of ever-increasing column compared against the watermark.
+        watermark: optional
+            Largest value of watermark_column already loaded. If None, every row is read.
         
         Returns
         -------
-        pandas.core.frame.DataFrame
-            DataFrame containing table data from RDS
+        pandas.core.frame.DataFrame or iterator of pandas.core.frame.DataFrame
+            DataFrame containing table data from RDS, or iterator of DataFrame chunks if chunksize is given
         '''
         # call init_db_engine() method of DatabaseConnector class
         engine = connector.init_db_engine()
-        # read SQL table specified as argument into pandas DataFrame
-        return pd.read_sql_table(table, engine)
+        if watermark is None:
+            source = f'rds:{connector.filename}:{table}'
+            quote = engine.dialect.identifier_preparer.quote
+            # the tables only grow, so their row count identifies their current version
+            count_rows = lambda: str(pd.read_sql_query(f'SELECT COUNT(*) FROM {quote(table)}', engine).iloc[0, 0])
+            if chunksize is not None:
+                stream = lambda: self._stream_rds_table(engine, pd.read_sql_table, table, chunksize)
+                if self.cache is None:
+                    return stream()
+                return self.cache.fetch_chunks(source, count_rows, stream, chunksize)
+            # read SQL table specified as argument into pandas DataFrame
+            return self._cached(source, count_rows, lambda: pd.read_sql_table(table, engine))
+        # select only the rows added since the watermark
+        quote = engine.dialect.identifier_preparer.quote
+        query = text(f'SELECT * FROM {quote(table)} WHERE {quote(watermark_column)} > :watermark ORDER BY {quote(watermark_column)}')
+        query = query.bindparams(watermark=watermark)
+        if chunksize is not None:
+            return self._stream_rds_table(engine, pd.read_sql_query, query, chunksize)
+        return pd.read_sql_query(query, engine)
+
+    def _stream_rds_table(self, engine, reader, sql, chunksize):
+        '''Yields chunks of an SQL table or query read through a server-side cursor, closing the connection once exhausted.'''
+        # stream_results stops psycopg2 from buffering the whole result set on the client
+        with engine.connect().execution_options(stream_results=True) as connection:
+            yield from reader(sql, connection, chunksize=chunksize)
     
-    def retrieve_pdf_data(self, link):
+    @instrumented
+    def retrieve_pdf_data(self, link, progress=None):
         '''Retrieves tabular data from cloud-based .pdf file and returns data as pandas DataFrame.
         
-        Takes a link to a pdf file stored in the cloud and uses read_pdf() method of the tabula module to read the data into
-        a pandas DataFrame, which is then returned.
+        Takes a link to a pdf file stored in the cloud and uses iter_pdf_pages() to read the tables on its pages in parallel,
+        concatenating them into a pandas DataFrame in page order, which is then returned.
         
         Parameters
         ----------
         link: str
             URL to cloud-based .pdf file.
+        progress: callable, optional
+            Function called as each range of pages is read, as described in iter_pdf_pages().
         
         Returns
         -------
         pandas.core.frame.DataFrame
             DataFrame containing table data from .pdf file
         '''
-        return pd.concat(tabula.read_pdf(link, pages='all'))
+        return self._cached(f'pdf:{link}', lambda: self._file_fingerprint(link),
+                            lambda: pd.concat(self.iter_pdf_pages(link, progress)))
+
+    def iter_pdf_pages(self, link, progress=None):
+        '''Downloads a .pdf file once and yields the tables on its pages in page order, reading ranges of pages in parallel.
+        
+        The file is downloaded to a temporary directory and its pages split into ranges of pdf_pages_per_task pages, which are
+        read with the read_pdf() method of the tabula module across a pool of pdf_workers processes. Each range's tables are
+        yielded as soon as it and every range before it have been read.
+        
+        Parameters
+        ----------
+        link: str
+            URL or path to .pdf file.
+        progress: callable, optional
+            Function called after each range of pages is read, with the range's first and last page numbers, the seconds taken
+            to read it, the number of pages read so far and the total number of pages.
+        
+        Returns
+        -------
+        generator of pandas.core.frame.DataFrame
+            DataFrames of the tables on the file's pages, in page order
+        '''
+        from pypdf import PdfReader # for counting the pages of .pdf files
+        with tempfile.TemporaryDirectory() as directory:
+            path = self._download(link, directory)
+            number_of_pages = len(PdfReader(path).pages)
+            pages_per_task = self.pdf_pages_per_task or max(1, math.ceil(number_of_pages / self.pdf_workers))
+            page_ranges = [(first_page, min(first_page + pages_per_task - 1, number_of_pages))
+                           for first_page in range(1, number_of_pages + 1, pages_per_task)]
+            if len(page_ranges) == 1:
+                # a single range gains nothing from a process pool, so read it here
+                frames, seconds = _read_pdf_pages(path, 1, number_of_pages)
+                if progress is not None:
+                    progress(1, number_of_pages, seconds, number_of_pages, number_of_pages)
+                yield from frames
+                return
+            # pipeline jobs run this in threads, and forking a process that has other threads running can deadlock it
+            with ProcessPoolExecutor(max_workers=self.pdf_workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = [executor.submit(_read_pdf_pages, path, first_page, last_page)
+                           for first_page, last_page in page_ranges]
+                pages_read = 0
+                # wait on the tasks in page order, so the tables come out in the order they appear
+                for (first_page, last_page), future in zip(page_ranges, futures):
+                    frames, seconds = future.result()
+                    pages_read += last_page - first_page + 1
+                    if progress is not None:
+                        progress(first_page, last_page, seconds, pages_read, number_of_pages)
+                    yield from frames
+
+    def _download(self, link, directory):
+        '''Downloads a remote file into a directory, returning its local path, or returns the path of a local file unchanged.'''
+        if os.path.exists(link):
+            return link
+        path = os.path.join(directory, os.path.basename(link.split('?')[0]) or 'download')
+        if link.startswith(('http://', 'https://')):
+            response = self._session(api=False).get(link, stream=True, timeout=self.timeout)
+            with response, open(path, 'wb') as file:
+                response.raise_for_status()
+                for block in response.iter_content(chunk_size=2**20):
+                    file.write(block)
+        else:
+            import fsspec
+            with fsspec.open(link, 'rb') as remote_file, open(path, 'wb') as file:
+                shutil.copyfileobj(remote_file, file)
+        return path
     
     def list_number_of_stores(self):
         '''Retrieves number of stores from api endpoint.
         
-        Utilises requests.get() method to retrieve json data regarding the number of stores from an api endpoint.
+        Utilises requests.get() method to retrieve json data regarding the number of stores from an api endpoint, retrying
+        failed requests as retrieve_store() does.
         
         Parameters
         ----------
@@ -93,14 +433,56 @@ class DataExtractor:
         -------
         Integer representing the number of store records available on api endpoint
         '''
-        response = requests.get(self.number_of_stores_endpoint, headers=self.api_header)
-        return response.json()['number_stores']
+        return self._get_json(self.number_of_stores_endpoint)['number_stores']
     
+    def retrieve_store(self, store_number, rate_limiter=None):
+        '''Retrieves a single store record from the api, retrying failed requests with exponential backoff.
+
+        Makes a GET request on the retrieve stores api endpoint using the calling thread's pooled session. Connection errors,
+        timeouts and 429/5xx responses are retried up to max_retries times, waiting backoff_factor * 2 ** attempt seconds in
+        between.
+
+        Parameters
+        ----------
+        store_number: int
+            Number of the store to retrieve.
+        rate_limiter: RateLimiter, optional
+            Limiter shared between all concurrent requests.
+
+        Returns
+        -------
+        dict
+            JSON record of the store.
+        '''
+        return self._get_json(self.get_store_endpoint + str(store_number), rate_limiter)
+
+    def _get_json(self, url, rate_limiter=None):
+        '''Returns the JSON response to a GET request to the store api, retrying failed requests with exponential backoff.'''
+        import requests
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.wait()
+            try:
+                response = self._session().get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                # only throttling and server errors are worth retrying
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+            time.sleep(self.backoff_factor * 2 ** attempt)
+
+    @instrumented
     def retrieve_stores_data(self):
-        '''Iteratively retrieves individual store records and adds them to pandas DataFrame.
+        '''Concurrently retrieves individual store records and collects them into a pandas DataFrame.
         
-        Initialises an empty pandas dataframe and then iteratively makes GET requests on the retrieve stores api endpoint, up
-        to the number of stores returned from calling the list_number_of_stores() method.
+        Makes GET requests on the retrieve stores api endpoint, up to the number of stores returned from calling the
+        list_number_of_stores() method, across a pool of max_workers threads. Records are collected into a list in store
+        number order and converted into a single DataFrame at the end.
         
         Parameters
         ----------
@@ -111,31 +493,102 @@ class DataExtractor:
         stores: pandas.core.frame.DataFrame
             DataFrame containing all the store data from api endpoint.
         '''
-        stores = pd.DataFrame()
-        for store_number in range(0, self.list_number_of_stores()):
-            response = requests.get(self.get_store_endpoint + str(store_number), headers=self.api_header)
-            new_dataframe = pd.DataFrame(response.json(), index=[0])
-            stores = pd.concat([stores, new_dataframe], ignore_index=True)
-        return stores
+        # the number of stores identifies the current version of the store data
+        return self._cached(f'api:{self.get_store_endpoint}', lambda: str(self.list_number_of_stores()), self._retrieve_stores)
+
+    def _retrieve_stores(self):
+        '''Retrieves every store record across a pool of threads, returning them as a DataFrame in store number order.'''
+        rate_limiter = RateLimiter(self.requests_per_second)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            records = list(executor.map(lambda number: self.retrieve_store(number, rate_limiter),
+                                        range(0, self.list_number_of_stores())))
+        return pd.DataFrame.from_records(records)
     
-    def extract_from_s3(self, endpoint):
-        '''Retrieves data from .json or .csv file stored in AWS S3.
+    @instrumented
+    def extract_from_s3(self, endpoint, watermark=None, chunksize=None, dtypes=None):
+        '''Retrieves data, or its rows beyond a watermark, from a .csv, .json, newline-delimited .json or .parquet file stored in AWS S3.
         
-        Retrieves either .csv or .json publicly-available files from Amazon S3 storage and returns a pandas dataframe containing
-        the data from endpoint file.
+        Streams the file from Amazon S3 storage, or from any other URL or path fsspec can open, with stream_file(), which
+        detects its format and any gzip, zstd or bz2 compression. By default the chunks are joined into a single pandas
+        DataFrame, but if chunksize is given they are returned as they are read, so that large files never have to be held in
+        memory. If a watermark is given, only rows whose index is greater than the watermark are returned. The whole file is
+        still read, as S3 can't filter rows, but only the new rows are passed on to be cleaned and loaded.
         
         Parameters
         ----------
         endpoint: str
             URL to S3-based file.
+        watermark: int, optional
+            Largest index already loaded. If None, every row is returned.
+        chunksize: int, optional
+            Number of rows per chunk. If None, a single DataFrame is returned.
+        dtypes: dict, optional
+            pyarrow type names, such as 'string' or 'int64', of columns whose type shouldn't be inferred.
         
         Returns
         -------
-        pandas.core.frame.DataFrame
-            DataFrame containing table data from S3 file'''
-        if endpoint[-3:] == 'csv':
-            # need to install s3fs library
-            return pd.read_csv(endpoint)
-        elif endpoint[-4:] == 'json':
-            return pd.read_json(endpoint)
-        
\ No newline at end of file
+        pandas.core.frame.DataFrame or generator of pandas.core.frame.DataFrame
+            DataFrame, or DataFrame chunks, containing table data from S3 file'''
+        source = f's3:{endpoint}'
+        fingerprint = lambda: self._file_fingerprint(endpoint)
+        if chunksize is None:
+            data = self._cached(source, fingerprint, lambda: pd.concat(self.stream_file(endpoint, dtypes=dtypes)))
+            if watermark is not None:
+                data = data[data.index > watermark].copy()
+            return data
+        stream = lambda: self.stream_file(endpoint, chunksize, dtypes)
+        if watermark is not None:
+            # cached chunks don't keep their index, so filtered reads always stream from the source
+            return (chunk[chunk.index > watermark] for chunk in stream())
+        if self.cache is None:
+            return stream()
+        return self.cache.fetch_chunks(source, fingerprint, stream, chunksize)
+
+    def stream_file(self, endpoint, chunksize=FILE_CHUNKSIZE, dtypes=None):
+        '''Yields the table in a .csv, .json, newline-delimited .json or .parquet file as pandas DataFrame chunks.
+        
+        The file is opened with fsspec and read FILE_BLOCK_SIZE bytes at a time, using range requests where the storage
+        supports them. Its compression and format are taken from its suffixes, or otherwise sniffed from its first bytes.
+        Compressed files are decompressed as they are read. .csv files are parsed block by block with pyarrow's streaming
+        reader, newline-delimited .json files chunksize lines at a time and .parquet files a row group at a time. A .json file
+        of columns or records can only be parsed whole, so it is read at once and then split into chunks. The chunks are
+        indexed consecutively from 0 across the file, as if it had been read in one go.
+        
+        Parameters
+        ----------
+        endpoint: str
+            URL or path to file.
+        chunksize: int
+            Number of rows per chunk.
+        dtypes: dict, optional
+            pyarrow type names of columns whose type shouldn't be inferred. The types of other .csv columns are inferred
+            from the first block of the file.
+        
+        Returns
+        -------
+        generator of pandas.core.frame.DataFrame
+        '''
+        import fsspec # for streaming files from S3 storage
+        compression, file_format = _format_from_suffixes(endpoint)
+        if file_format != 'parquet':
+            # other formats are read from start to end, so files over http are streamed by a single request
+            block_size = 0 if endpoint.startswith(('http://', 'https://')) else FILE_BLOCK_SIZE
+            with fsspec.open(endpoint, 'rb', block_size=block_size) as file:
+                # buffer the file so that its first bytes can be sniffed without consuming them
+                stream = io.BufferedReader(file, FILE_BLOCK_SIZE)
+                head = stream.peek(4)[:4]
+                if compression is None and file_format is None and head == b'PAR1':
+                    file_format = 'parquet'
+                else:
+                    compression = compression or next(
+                        (codec for magic, codec in COMPRESSION_MAGIC.items() if head.startswith(magic)), None)
+                    if compression is not None:
+                        # decompress as the file is read
+                        stream = io.BufferedReader(pa.CompressedInputStream(stream, compression), FILE_BLOCK_SIZE)
+                    yield from _read_text_chunks(stream, file_format, chunksize, dtypes)
+                    return
+        # Parquet files are compressed internally, and are read from their footer, so need random access
+        import pyarrow.parquet as pq
+        with fsspec.open(endpoint, 'rb', block_size=FILE_BLOCK_SIZE) as file:
+            batches = pq.ParquetFile(file).iter_batches(batch_size=chunksize)
+            yield from _index_chunks(batch.to_pandas() for batch in batches)
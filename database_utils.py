@@ -1,38 +1,158 @@
-import yaml
-from sqlalchemy import create_engine, inspect
+import io
+import threading
+from sqlalchemy import Column, MetaData, Table, create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from instrumentation import instrumented
+
+class HighWaterMark:
+    '''This class tracks the largest value of a column, or of the index, across DataFrame chunks as they stream past.
+
+    Attributes
+    ----------
+    column:
+        This is the name of the tracked column, or None to track the index.
+    value:
+        This is the largest value seen so far, starting from the watermark of the previous load.
+
+    Methods
+    -------
+    __init__(self, column, value):
+        Initialises an instance of the HighWaterMark class.
+    track(self, chunks):
+        Yields each chunk unchanged, updating value with the chunk's largest value.
+    '''
+    def __init__(self, column=None, value=None):
+        '''Initialises an instance of the HighWaterMark class.
+
+        Parameters
+        ----------
+        column: str, optional
+            Name of tracked column. If None, the index is tracked.
+        value: optional
+            Watermark of the previous load, if any.
+        '''
+        self.column = column
+        self.value = value
+
+    def track(self, chunks):
+        '''Yields each chunk unchanged, updating value with the chunk's largest value.
+
+        Parameters
+        ----------
+        chunks: pandas.core.frame.DataFrame or iterable of pandas.core.frame.DataFrame
+            DataFrame, or DataFrame chunks, read from the source.
+
+        Returns
+        -------
+        generator of pandas.core.frame.DataFrame
+        '''
+        import pandas as pd # already loaded by whatever read the chunks
+        if isinstance(chunks, pd.DataFrame):
+            chunks = [chunks]
+        for chunk in chunks:
+            if len(chunk):
+                values = chunk.index if self.column is None else chunk[self.column]
+                chunk_max = int(values.max())
+                self.value = chunk_max if self.value is None else max(self.value, chunk_max)
+            yield chunk
 
 class DatabaseConnector:
     '''This class contains methods for connecting to databases.
     
     Attributes
     ----------
+    filename:
+        This is the name of the YAML file containing the database credentials.
+    pool_size:
+        This is the number of connections kept open in the engine's connection pool.
+    max_overflow:
+        This is the number of connections that may be opened beyond pool_size when the pool is exhausted.
+    pool_pre_ping:
+        This is whether pooled connections are tested for liveness before being handed out.
+    metadata:
+        This is the sqlalchemy MetaData declaring the columns, types, primary keys and indexes of tables, or None.
+    max_insert_parameters:
+        This is the largest number of bound parameters sent in a single multi-row INSERT on databases without COPY.
+    watermark_table:
+        This is the name of the table holding the high-water mark of each incrementally loaded table.
+    retired_suffix:
+        This is the suffix given to a table replaced by a full load while the summaries built from it are still read.
+    summaries_schema:
+        This is the name of the schema rebuild_materialized_views() builds the new summaries in.
 
     Methods
     -------
-    __init__(self, filename):
+    __init__(self, filename, pool_size=5, max_overflow=10, pool_pre_ping=True, metadata=None):
         Initialises an instance of the DatabaseConnector class.
     read_db_creds(self):
         Retrieves database credentials from the YAML filename passed in upon class instantiation.
+    connection_string(self):
+        Builds the Postgresql connection string from the database credentials.
     init_db_engine(self):
-        Initialises Postgresql database connection.
+        Returns the connector's sqlalchemy engine, creating it on first use.
+    dispose(self):
+        Closes every pooled connection and discards the engine.
     list_db_tables(self):
         Gets the table names of a given database.
-    upload_to_db(self, dataframe, table):
-        Uploads pandas DataFrame to SQL database.
+    upload_to_db(self, dataframe, table, high_water_mark=None):
+        Uploads pandas DataFrame, or an iterable of DataFrame chunks, to SQL database.
+    upsert_to_db(self, dataframe, table, conflict_columns=None, high_water_mark=None):
+        Inserts pandas DataFrame, or an iterable of DataFrame chunks, into an existing table, skipping or updating conflicts.
+    read_watermark(self, table):
+        Returns the high-water mark recorded by the last load of a table.
+    bulk_insert(self, connection, dataframe, table):
+        Appends pandas DataFrame to an existing table using the fastest method the database supports.
+    run_sql_file(self, filename):
+        Runs the SQL statements in a file against the database in a single transaction.
+    validate_constraints(self, table):
+        Checks the existing rows of a Postgresql table against every constraint added to it NOT VALID.
+    retired_tables(self):
+        Returns the names of the tables replaced by full loads but kept until the summaries built from them are rebuilt.
+    refresh_materialized_views(self, views=None):
+        Refreshes the materialized views of a Postgresql database, concurrently where they have already been filled.
+    rebuild_materialized_views(self, filename):
+        Builds the materialized views declared in a SQL file afresh, swaps them in and drops the retired tables.
     '''
-    def __init__(self, filename):
+    # SQLite's default limit on bound parameters per statement
+    max_insert_parameters = 999
+    watermark_table = 'pipeline_watermarks'
+    retired_suffix = '_old'
+    summaries_schema = 'summaries_staging'
+
+    def __init__(self, filename, pool_size=5, max_overflow=10, pool_pre_ping=True, metadata=None):
         '''Initialises an instance of the DatabaseConnector class.
         
         Parameters
         ----------
         filename: str
             Name of YAML file containing database credentials.
+        pool_size: int
+            Number of connections kept open in the connection pool.
+        max_overflow: int
+            Number of connections that may be opened beyond pool_size.
+        pool_pre_ping: bool
+            Whether to test pooled connections for liveness before use.
+        metadata: sqlalchemy.MetaData, optional
+            Declarations of the tables to load with fixed types, keys and indexes, such as table_schemas.metadata. Tables
+            that aren't declared are created with the types pandas infers from their first chunk.
         
         Returns
         -------
         None
         '''
         self.filename = filename
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_pre_ping = pool_pre_ping
+        self.metadata = metadata
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.dispose()
 
     def read_db_creds(self):
         '''Retrieves database credentials from the YAML filename passed in upon class instantiation.
@@ -48,15 +168,36 @@ class DatabaseConnector:
         dict
             Contents of YAML file as dictionary.
         '''
+        import yaml # read once, when the engine is created
         # Use context manager to open file
         with open(self.filename, 'r') as file:
             # load contents into dictionary and return
             return yaml.safe_load(file)
 
+    def connection_string(self):
+        '''Builds the Postgresql connection string from the database credentials.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        str
+            sqlalchemy database URL.
+        '''
+        # Call read_db_creds() method to get database credentials as dictionary
+        db_credentials = self.read_db_creds()
+        # Construct connection string using contents of dictionary
+        return f"postgresql+psycopg2://{db_credentials['RDS_USER']}:{db_credentials['RDS_PASSWORD']}@" + \
+               f"{db_credentials['RDS_HOST']}:{db_credentials['RDS_PORT']}/{db_credentials['RDS_DATABASE']}"
+
     def init_db_engine(self):
-        '''Initialises Postgresql database connection.
+        '''Returns the connector's sqlalchemy engine, creating it on first use.
         
-        Creates a connection string of database credentials and uses that string to create and return sqlalchemy database engine.
+        The first call reads the credentials, creates a sqlalchemy database engine with a connection pool configured from the
+        pool_size, max_overflow and pool_pre_ping attributes, and keeps it for the lifetime of the connector. Later calls, from
+        any thread, return the same engine and so share its pool.
         
         Parameters
         ----------
@@ -67,13 +208,34 @@ class DatabaseConnector:
         sqlalchemy.engine.base.Engine
             sqlalchemy engine for database connection.
         '''
-        # Call read_db_creds() method to get database credentials as dictionary
-        db_credentials = self.read_db_creds()
-        # Construct connection string using contents of dictionary
-        connection_string = f"postgresql+psycopg2://{db_credentials['RDS_USER']}:{db_credentials['RDS_PASSWORD']}@" + \
-                            f"{db_credentials['RDS_HOST']}:{db_credentials['RDS_PORT']}/{db_credentials['RDS_DATABASE']}"
-        # Create new sqlalchemy database engine and return
-        return create_engine(connection_string)
+        with self._engine_lock:
+            if self._engine is None:
+                connection_string = self.connection_string()
+                pool_options = {'pool_pre_ping': self.pool_pre_ping}
+                # SQLite does not use a QueuePool, so does not accept its sizing arguments
+                if make_url(connection_string).get_backend_name() != 'sqlite':
+                    pool_options.update(pool_size=self.pool_size, max_overflow=self.max_overflow)
+                self._engine = create_engine(connection_string, **pool_options)
+            return self._engine
+
+    def dispose(self):
+        '''Closes every pooled connection and discards the engine.
+        
+        A later call to init_db_engine() creates a fresh engine. The connector can also be used as a context manager, which
+        calls dispose() on exit.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        '''
+        with self._engine_lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
         
     def list_db_tables(self):
         '''Gets the table names of a given database.
@@ -93,22 +255,382 @@ class DatabaseConnector:
         inspector = inspect(self.init_db_engine())
         return inspector.get_table_names()
 
-    def upload_to_db(self, dataframe, table):
-        '''Uploads pandas DataFrame to SQL database.
+    @instrumented
+    def upload_to_db(self, dataframe, table, high_water_mark=None):
+        '''Uploads pandas DataFrame, or an iterable of DataFrame chunks, to SQL database.
         
-        Utilises init_db_engine() method to connect to Postgresql database, then pandas to_sql() method to upload DataFrame to
-        given database table.
+        Utilises init_db_engine() method to connect to Postgresql database, creates an empty staging table and bulk loads every
+        chunk into it with bulk_insert(). If the table is declared in metadata, the staging table is created with its declared
+        column types, so the rows are converted once as they are loaded; otherwise it takes the columns of the first DataFrame
+        chunk. The staging table then replaces the given table within the same transaction, so readers see either the old
+        table or the complete new one, and is given the declared primary key and indexes once it is full. On Postgresql
+        a table that foreign keys or views depend on is kept, renamed, by _swap_table(), so the summaries keep serving the old
+        figures until the summaries job rebuilds them. Chunks, such as the iterator returned by DataExtractor.read_rds_table()
+        with a chunksize, are loaded one at a time.
         
         Parameters
         ----------
-        dataframe: pandas.core.frame.DataFrame
-            DataFrame to be uploaded to SQL database.
+        dataframe: pandas.core.frame.DataFrame or iterable of pandas.core.frame.DataFrame
+            DataFrame, or DataFrame chunks, to be uploaded to SQL database.
         table: str
             Name of table in SQL database to upload to.
+        high_water_mark: HighWaterMark, optional
+            Tracker of the chunks' watermark, recorded in the same transaction for later incremental loads.
+        
+        Returns
+        -------
+        None
+        '''
+        engine = self.init_db_engine()
+        staging_table = f'{table}_staging'
+        with engine.begin() as connection:
+            if self._load_staging_table(connection, dataframe, staging_table, declared_table=table):
+                self._swap_table(connection, staging_table, table)
+            if high_water_mark is not None:
+                self._write_watermark(connection, table, high_water_mark.value)
+
+    @instrumented
+    def upsert_to_db(self, dataframe, table, conflict_columns=None, high_water_mark=None):
+        '''Inserts pandas DataFrame, or an iterable of DataFrame chunks, into an existing table, skipping or updating conflicts.
+        
+        Bulk loads the chunks into a staging table as upload_to_db() does, then copies them into the given table with a single
+        INSERT ... ON CONFLICT statement. Rows clashing with existing rows on conflict_columns, which must have a primary key or
+        unique constraint, overwrite them; without conflict_columns, rows breaking any constraint are skipped. If the table
+        doesn't exist yet, the staging table, created as in upload_to_db(), becomes the table. The watermark is recorded in the
+        same transaction, so a failed load never advances it.
+        
+        Parameters
+        ----------
+        dataframe: pandas.core.frame.DataFrame or iterable of pandas.core.frame.DataFrame
+            DataFrame, or DataFrame chunks, containing only the new or changed rows.
+        table: str
+            Name of table in SQL database to insert into.
+        conflict_columns: list of str, optional
+            Columns of the table's primary key or unique constraint used to match existing rows.
+        high_water_mark: HighWaterMark, optional
+            Tracker of the chunks' watermark, recorded in the same transaction for the next incremental load.
+        
+        Returns
+        -------
+        None
+        '''
+        engine = self.init_db_engine()
+        staging_table = f'{table}_staging'
+        quote = engine.dialect.identifier_preparer.quote
+        with engine.begin() as connection:
+            table_exists = inspect(connection).has_table(table)
+            # give the staging table the existing table's column types, so its rows insert without casts
+            columns = self._load_staging_table(connection, dataframe, staging_table,
+                                               like_table=table if table_exists else None, declared_table=table)
+            if columns and not table_exists:
+                connection.exec_driver_sql(f'ALTER TABLE {quote(staging_table)} RENAME TO {quote(table)}')
+                self._add_keys(connection, table)
+            elif columns:
+                column_list = ', '.join(quote(column) for column in columns)
+                if conflict_columns:
+                    updates = ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}'
+                                        for column in columns if column not in conflict_columns)
+                    conflict = f"({', '.join(quote(column) for column in conflict_columns)}) " + \
+                               (f'DO UPDATE SET {updates}' if updates else 'DO NOTHING')
+                else:
+                    conflict = 'DO NOTHING'
+                # WHERE true stops SQLite parsing ON CONFLICT as part of the SELECT
+                connection.exec_driver_sql(f'INSERT INTO {quote(table)} ({column_list}) '
+                                           f'SELECT {column_list} FROM {quote(staging_table)} WHERE true '
+                                           f'ON CONFLICT {conflict}')
+                connection.exec_driver_sql(f'DROP TABLE {quote(staging_table)}')
+            if high_water_mark is not None:
+                self._write_watermark(connection, table, high_water_mark.value)
+
+    def _load_staging_table(self, connection, dataframe, staging_table, like_table=None, declared_table=None):
+        '''Bulk loads DataFrame chunks into a freshly created staging table, returning its columns, or None if there were no chunks.'''
+        import pandas as pd # already loaded by whatever cleaned the chunks
+        if isinstance(dataframe, pd.DataFrame):
+            dataframe = [dataframe]
+        quote = connection.dialect.identifier_preparer.quote
+        declared = self._declared(declared_table)
+        columns = None
+        for chunk in dataframe:
+            if columns is None:
+                if like_table is None and declared is not None:
+                    # create empty staging table with the declared column types, leaving the primary key until it is loaded
+                    # except on SQLite, which can't add one to an existing table
+                    keyed = connection.dialect.name == 'sqlite'
+                    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {quote(staging_table)}')
+                    Table(staging_table, MetaData(), *(Column(column.name, column.type, primary_key=keyed and column.primary_key)
+                                                       for column in declared.columns)).create(connection)
+                elif like_table is None:
+                    # create empty staging table with the columns and types of the first chunk
+                    chunk.head(0).to_sql(staging_table, connection, index=False, if_exists='replace')
+                else:
+                    # create empty staging table with the columns and types of the existing table
+                    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {quote(staging_table)}')
+                    connection.exec_driver_sql(f'CREATE TABLE {quote(staging_table)} AS SELECT * FROM {quote(like_table)} WHERE 1 = 0')
+                columns = list(chunk.columns)
+            self.bulk_insert(connection, chunk, staging_table)
+        return columns
+
+    def _swap_table(self, connection, staging_table, table):
+        '''Replaces a table with a fully loaded staging table, leaving the foreign keys and views that depend on it in place.
+
+        On Postgresql, a table that other tables' foreign keys or views depend on is renamed, with the retired_suffix, rather
+        than dropped, along with its indexes, so the summaries built from it keep serving the old figures until
+        rebuild_materialized_views() rebuilds them over the new table and drops it. If the table retired by an earlier load
+        is still waiting to be dropped, the summaries read that one, so the table being replaced is dropped instead, with any
+        foreign keys added to it since, which the schema job adds back.
+        '''
+        quote = connection.dialect.identifier_preparer.quote
+        retired = f'{table}{self.retired_suffix}'
+        if connection.dialect.name == 'postgresql' and self._has_dependents(connection, table):
+            if inspect(connection).has_table(retired):
+                connection.exec_driver_sql(f'DROP TABLE {quote(table)} CASCADE')
+            else:
+                indexes = connection.execute(text(
+                    'SELECT class.relname FROM pg_index JOIN pg_class AS class ON class.oid = pg_index.indexrelid '
+                    'WHERE pg_index.indrelid = to_regclass(:table)'), {'table': table}).fetchall()
+                # free the names of the primary key and indexes for the new table
+                for index, in indexes:
+                    connection.exec_driver_sql(f'ALTER INDEX {quote(index)} RENAME TO {quote(index + self.retired_suffix)}')
+                connection.exec_driver_sql(f'ALTER TABLE {quote(table)} RENAME TO {quote(retired)}')
+        else:
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS {quote(table)}')
+        connection.exec_driver_sql(f'ALTER TABLE {quote(staging_table)} RENAME TO {quote(table)}')
+        self._add_keys(connection, table)
+
+    def _has_dependents(self, connection, table):
+        '''Returns whether any view, or any other table's foreign key, depends on a Postgresql table.'''
+        return connection.execute(text(
+            "SELECT EXISTS ("
+            "    SELECT 1 FROM pg_depend AS depend JOIN pg_rewrite AS rewrite ON rewrite.oid = depend.objid"
+            "    WHERE depend.classid = 'pg_rewrite'::regclass AND depend.refobjid = to_regclass(:table)"
+            "    AND rewrite.ev_class <> depend.refobjid"
+            ") OR EXISTS ("
+            "    SELECT 1 FROM pg_constraint WHERE contype = 'f' AND confrelid = to_regclass(:table) AND conrelid <> confrelid"
+            ")"), {'table': table}).scalar()
+
+    def retired_tables(self):
+        '''Returns the names of the tables replaced by full loads but kept, with the retired_suffix, until the summaries built
+        from them are rebuilt.
+
+        Returns
+        -------
+        list of str
+        '''
+        with self.init_db_engine().connect() as connection:
+            tables = set(inspect(connection).get_table_names())
+        return sorted(table for table in tables
+                      if table.endswith(self.retired_suffix) and table[:-len(self.retired_suffix)] in tables)
+
+    def _declared(self, table):
+        '''Returns the declaration of a table in metadata, or None if it isn't declared.'''
+        return self.metadata.tables.get(table) if self.metadata is not None and table is not None else None
+
+    def _add_keys(self, connection, table):
+        '''Adds the declared primary key and indexes to a freshly loaded table, where it is declared.'''
+        declared = self._declared(table)
+        if declared is None:
+            return
+        quote = connection.dialect.identifier_preparer.quote
+        # SQLite tables are created with their primary key
+        if declared.primary_key.columns and connection.dialect.name != 'sqlite':
+            key = ', '.join(quote(column.name) for column in declared.primary_key.columns)
+            connection.exec_driver_sql(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({key})')
+        for index in declared.indexes:
+            index.create(connection)
+
+    def read_watermark(self, table):
+        '''Returns the high-water mark recorded by the last load of a table.
+        
+        Parameters
+        ----------
+        table: str
+            Name of table in SQL database.
+        
+        Returns
+        -------
+        int or None
+            Largest source index or id loaded into the table, or None if the table has never been loaded with a watermark.
+        '''
+        with self.init_db_engine().connect() as connection:
+            if not inspect(connection).has_table(self.watermark_table):
+                return None
+            return connection.execute(text(f'SELECT watermark FROM {self.watermark_table} WHERE table_name = :table'),
+                                      {'table': table}).scalar()
+
+    def _write_watermark(self, connection, table, watermark):
+        '''Records the high-water mark of a table in the watermark table, creating it if needed.'''
+        if watermark is None:
+            return
+        connection.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {self.watermark_table} '
+                                   '(table_name VARCHAR(255) PRIMARY KEY, watermark BIGINT NOT NULL, updated_at TIMESTAMP NOT NULL)')
+        connection.execute(text(f'INSERT INTO {self.watermark_table} (table_name, watermark, updated_at) '
+                                'VALUES (:table, :watermark, CURRENT_TIMESTAMP) ON CONFLICT (table_name) '
+                                'DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = EXCLUDED.updated_at'),
+                           {'table': table, 'watermark': int(watermark)})
+
+    def bulk_insert(self, connection, dataframe, table):
+        '''Appends pandas DataFrame to an existing table using the fastest method the database supports.
+        
+        On Postgresql the DataFrame is written to an in-memory CSV buffer and streamed into the table with COPY FROM STDIN.
+        Other server databases fall back to pandas to_sql() with multi-row INSERT statements, and SQLite to executemany().
+        
+        Parameters
+        ----------
+        connection: sqlalchemy.engine.base.Connection
+            Open connection, usually inside a transaction.
+        dataframe: pandas.core.frame.DataFrame
+            DataFrame to be appended to the table.
+        table: str
+            Name of existing table with the same columns as the DataFrame.
+        
+        Returns
+        -------
+        None
+        '''
+        if connection.dialect.name == 'postgresql':
+            quote = connection.dialect.identifier_preparer.quote
+            buffer = io.StringIO()
+            # write nulls as \N so that empty strings are not loaded as NULL
+            dataframe.to_csv(buffer, index=False, header=False, na_rep='\\N')
+            buffer.seek(0)
+            columns = ', '.join(quote(column) for column in dataframe.columns)
+            cursor = connection.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {quote(table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+            finally:
+                cursor.close()
+        elif connection.dialect.name == 'sqlite':
+            # SQLite runs in-process, so executemany() beats compiling large multi-row statements
+            dataframe.to_sql(table, connection, index=False, if_exists='append')
+        else:
+            rows_per_insert = max(1, self.max_insert_parameters // max(1, len(dataframe.columns)))
+            dataframe.to_sql(table, connection, index=False, if_exists='append', method='multi', chunksize=rows_per_insert)
+
+    @instrumented
+    def run_sql_file(self, filename):
+        '''Runs the SQL statements in a file against the database in a single transaction.
+        
+        Parameters
+        ----------
+        filename: str
+            Name of file containing SQL statements separated by semicolons.
         
         Returns
         -------
         None
         '''
+        with open(filename, 'r') as file:
+            statements = file.read()
+        # psycopg2 accepts several statements in one execute() call
+        with self.init_db_engine().begin() as connection:
+            connection.exec_driver_sql(statements)
+
+    @instrumented
+    def validate_constraints(self, table):
+        '''Checks the existing rows of a Postgresql table against every constraint added to it NOT VALID.
+
+        Each constraint is validated with ALTER TABLE ... VALIDATE CONSTRAINT, in a single transaction, which raises if any
+        row breaks it and otherwise marks it valid.
+
+        Parameters
+        ----------
+        table: str
+            Name of table.
+
+        Returns
+        -------
+        None
+        '''
+        with self.init_db_engine().begin() as connection:
+            quote = connection.dialect.identifier_preparer.quote
+            constraints = connection.execute(text(
+                'SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table) AND NOT convalidated ORDER BY conname'),
+                {'table': table}).scalars().all()
+            for constraint in constraints:
+                connection.exec_driver_sql(f'ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {quote(constraint)}')
+
+    @instrumented
+    def refresh_materialized_views(self, views=None):
+        '''Refreshes the materialized views of a Postgresql database, concurrently where they have already been filled.
+        
+        A view that has been filled before and has a unique index is refreshed with REFRESH MATERIALIZED VIEW CONCURRENTLY,
+        which lets queries keep reading its previous contents while it is refreshed. Others, such as views just created WITH
+        NO DATA, are filled with a plain REFRESH. Each view is refreshed in its own transaction, in the order the views were
+        created, so that views built from other views are refreshed after them.
+        
+        Parameters
+        ----------
+        views: list of str, optional
+            Names of views to refresh. If None, every materialized view in the current schema is refreshed.
+        
+        Returns
+        -------
+        list
+            Names of the views refreshed.
+        '''
+        engine = self.init_db_engine()
+        quote = engine.dialect.identifier_preparer.quote
+        with engine.connect() as connection:
+            matviews = connection.exec_driver_sql(
+                'SELECT matviewname, ispopulated AND EXISTS ('
+                '    SELECT 1 FROM pg_index WHERE indrelid = (quote_ident(schemaname) || \'.\' || quote_ident(matviewname))::regclass'
+                '    AND indisunique AND indexprs IS NULL AND indpred IS NULL) '
+                'FROM pg_matviews WHERE schemaname = current_schema() '
+                # views are created after the views they are built from, so refresh them in the same order
+                'ORDER BY (quote_ident(schemaname) || \'.\' || quote_ident(matviewname))::regclass::oid').fetchall()
+        refreshed = []
+        for view, concurrently in matviews:
+            if views is not None and view not in views:
+                continue
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{quote(view)}")
+            refreshed.append(view)
+        return refreshed
+
+    @instrumented
+    def rebuild_materialized_views(self, filename):
+        '''Builds the materialized views declared in a SQL file afresh, swaps them in and drops the retired tables.
+
+        After full loads the summaries are still built from the retired tables, so refreshing them would only repeat the old
+        figures. Instead the file is run in the summaries_schema, ahead of the current schema on the search path, so the
+        views are created there over the new tables, and each is filled once, in the order they were created, while queries
+        keep reading the old ones. A short transaction then drops the old views and the retired tables, and moves the new
+        views, with their indexes, into the current schema, so queries waiting on it go on to read the new figures.
+
+        Parameters
+        ----------
+        filename: str
+            Name of SQL file creating the materialized views, each IF NOT EXISTS and without a schema.
+
+        Returns
+        -------
+        list
+            Names of the views rebuilt.
+        '''
+        with open(filename, 'r') as file:
+            statements = file.read()
         engine = self.init_db_engine()
-        dataframe.to_sql(table, engine, index=False, if_exists='replace')
\ No newline at end of file
+        quote = engine.dialect.identifier_preparer.quote
+        staging = quote(self.summaries_schema)
+        retired = self.retired_tables()
+        with engine.begin() as connection:
+            schema = connection.exec_driver_sql('SELECT current_schema()').scalar()
+            connection.exec_driver_sql(f'DROP SCHEMA IF EXISTS {staging} CASCADE')
+            connection.exec_driver_sql(f'CREATE SCHEMA {staging}')
+            connection.exec_driver_sql(f'SET LOCAL search_path TO {staging}, {quote(schema)}')
+            connection.exec_driver_sql(statements)
+            views = [view for view, in connection.execute(text(
+                'SELECT matviewname FROM pg_matviews WHERE schemaname = :schema '
+                "ORDER BY (quote_ident(schemaname) || '.' || quote_ident(matviewname))::regclass::oid"),
+                {'schema': self.summaries_schema})]
+            for view in views:
+                connection.exec_driver_sql(f'REFRESH MATERIALIZED VIEW {staging}.{quote(view)}')
+        with engine.begin() as connection:
+            for view in views:
+                connection.exec_driver_sql(f'DROP MATERIALIZED VIEW IF EXISTS {quote(schema)}.{quote(view)} CASCADE')
+            for table in retired:
+                connection.exec_driver_sql(f'DROP TABLE {quote(schema)}.{quote(table)} CASCADE')
+            for view in views:
+                connection.exec_driver_sql(f'ALTER MATERIALIZED VIEW {staging}.{quote(view)} SET SCHEMA {quote(schema)}')
+            connection.exec_driver_sql(f'DROP SCHEMA {staging}')
+        return views
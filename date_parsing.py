@@ -0,0 +1,124 @@
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+import instrumentation
+
+# formats found in the sources' date columns, most common first, such as '2005-12-02', '1968 October 16' and
+# 'October 1968 16'; day-first and month-first numeric formats are left out, as they can't be told apart
+DATE_FORMATS = ['%Y-%m-%d', '%Y %B %d', '%B %Y %d', '%Y/%m/%d']
+# name under which values parsed without a known format are counted
+FALLBACK = 'inferred'
+
+class DateParser:
+    '''This class converts columns of date strings in a mix of formats to datetimes, trying known formats before inference.
+
+    Calling pd.to_datetime() without a format infers the format of each string separately, which is slow on large frames.
+    Instead, each distinct string in a column is parsed once, with each of a ranked list of known formats in turn, and only
+    the strings matching none of them are passed to pd.to_datetime() to be inferred as before. As formats are always tried
+    in the same order and a string keeps the first format it matches, the result doesn't depend on the order of the rows or
+    on how a table is split into chunks. The inferred strings are kept, so repeated ones are only inferred once per parser.
+
+    Attributes
+    ----------
+    formats:
+        This is the list of strptime formats tried, in order.
+    counts:
+        This is a Counter of the number of values parsed with each format, and by inference under 'inferred'.
+
+    Methods
+    -------
+    __init__(self, formats, max_cached):
+        Initialises an instance of the DateParser class.
+    parse(self, values, column):
+        Converts a Series of date strings to datetimes.
+    add_counts(self, counts):
+        Adds the number of values parsed with each format elsewhere, such as by a worker process, to counts.
+    '''
+    def __init__(self, formats=DATE_FORMATS, max_cached=100000):
+        '''Initialises an instance of the DateParser class.
+
+        Parameters
+        ----------
+        formats: list of str
+            strptime formats to try, most common first.
+        max_cached: int
+            Number of inferred strings kept, above which they are forgotten.
+        '''
+        self.formats = list(formats)
+        self.counts = Counter()
+        self.max_cached = max_cached
+        self._inferred = {}
+        self._lock = threading.Lock()
+
+    def parse(self, values, column=None):
+        '''Converts a Series of date strings to datetimes.
+
+        Null values become NaT. Strings matching none of the formats are inferred by pd.to_datetime(), which raises if they
+        can't be parsed at all. The number of values parsed with each format is added to counts and, when instrumentation is
+        enabled, to the current stage's record.
+
+        Parameters
+        ----------
+        values: pandas.core.series.Series
+            Series of date strings.
+        column: str, optional
+            Name the counts are recorded under. If None, the Series' name is used.
+
+        Returns
+        -------
+        pandas.core.series.Series
+            Series of datetime64 values with the same index.
+        '''
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        # parse each distinct string once, then spread the results back over the rows
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+        parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+        matched = np.full(len(uniques), -1)
+        remaining = pd.Series(True, index=uniques.index)
+        for number, date_format in enumerate(self.formats):
+            if not remaining.any():
+                break
+            attempt = pd.to_datetime(uniques[remaining], format=date_format, errors='coerce')
+            attempt = attempt[attempt.notna()]
+            parsed[attempt.index] = attempt
+            matched[attempt.index] = number
+            remaining[attempt.index] = False
+        leftover = uniques[remaining]
+        if len(leftover):
+            parsed[leftover.index] = self._infer(leftover)
+            matched[leftover.index] = len(self.formats)
+        # count rows rather than distinct strings, leaving out nulls
+        rows = np.bincount(matched[codes[codes >= 0]], minlength=len(self.formats) + 1)
+        counts = {name: int(count) for name, count in zip(self.formats + [FALLBACK], rows) if count}
+        with self._lock:
+            self.counts.update(counts)
+        instrumentation.record_date_formats(column or values.name, counts)
+        result = parsed.to_numpy()[codes]
+        result[codes < 0] = np.datetime64('NaT')
+        return pd.Series(result, index=values.index, name=values.name)
+
+    def add_counts(self, counts):
+        '''Adds the number of values parsed with each format elsewhere, such as by a worker process, to counts.
+
+        Parameters
+        ----------
+        counts: dict
+            Number of values parsed with each format, as in counts.
+        '''
+        with self._lock:
+            self.counts.update(counts)
+
+    def _infer(self, strings):
+        '''Infers the format of each string with pd.to_datetime(), reusing the results for strings seen before.'''
+        results = {string: self._inferred.get(string) for string in strings}
+        new = [string for string, value in results.items() if value is None]
+        if new:
+            results.update(zip(new, pd.to_datetime(pd.Series(new, dtype=object))))
+            with self._lock:
+                if len(self._inferred) + len(new) > self.max_cached:
+                    self._inferred.clear()
+                self._inferred.update((string, results[string]) for string in new)
+        return pd.to_datetime(pd.Series([results[string] for string in strings], index=strings.index, dtype=object))
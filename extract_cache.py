@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class ExtractCache:
+    '''This class stores raw extracts as Parquet files on disk, so that cleaning can be rerun without extracting again.
+
+    Each entry is keyed by its source and a fingerprint of the source's current state, such as an ETag, Last-Modified date or
+    row count, so that a changed source is extracted again. Entries are stored as a Parquet file alongside a small JSON file
+    of metadata, which keeps concurrent pipeline processes from contending for a shared index. Entries older than ttl seconds
+    are expired, and the least recently used entries are evicted once the cache grows beyond max_bytes.
+
+    Attributes
+    ----------
+    directory:
+        This is the directory the cache files are stored in.
+    ttl:
+        This is the number of seconds after which an entry is no longer used, or None to keep entries until evicted.
+    max_bytes:
+        This is the total size of Parquet files above which the least recently used entries are evicted.
+    mode:
+        This is 'normal' to use entries matching the source's fingerprint, 'offline' to use the latest entry of each source
+        without contacting it, or 'refresh' to always extract again and replace the cached entry.
+
+    Methods
+    -------
+    __init__(self, directory, ttl, max_bytes, mode):
+        Initialises an instance of the ExtractCache class.
+    fetch(self, source, fingerprint, extract):
+        Returns the cached extract of a source, extracting and caching it first if needed.
+    fetch_chunks(self, source, fingerprint, extract, chunksize):
+        Yields the cached extract of a source in chunks, streaming it into the cache first if needed.
+    evict(self):
+        Removes expired entries, then the least recently used entries until the cache fits in max_bytes.
+    '''
+    modes = ('normal', 'offline', 'refresh')
+
+    def __init__(self, directory='.extract_cache', ttl=7 * 24 * 60 * 60, max_bytes=2 * 2**30, mode='normal'):
+        '''Initialises an instance of the ExtractCache class.
+
+        Parameters
+        ----------
+        directory: str
+            Directory to store the cache files in, created if it doesn't exist.
+        ttl: float, optional
+            Number of seconds after which an entry is no longer used. If None, entries are kept until evicted.
+        max_bytes: int
+            Total size of Parquet files above which the least recently used entries are evicted.
+        mode: str
+            One of 'normal', 'offline' or 'refresh'.
+        '''
+        if mode not in self.modes:
+            raise ValueError(f"mode must be one of {', '.join(self.modes)}, not {mode!r}")
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        os.makedirs(directory, exist_ok=True)
+
+    def fetch(self, source, fingerprint, extract):
+        '''Returns the cached extract of a source, extracting and caching it first if needed.
+
+        Parameters
+        ----------
+        source: str
+            Name identifying the source, such as its URL.
+        fingerprint: callable
+            Function returning a string that changes whenever the source's data changes. Not called in offline mode.
+        extract: callable
+            Function returning the source's data as a pandas DataFrame.
+
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+            Extracted or cached data.
+        '''
+        entry, current_fingerprint = self._lookup(source, fingerprint)
+        if entry is not None:
+            self._touch(entry)
+            # memory-map the file rather than reading it through a buffer
+            return pd.read_parquet(self._path(entry['key'], '.parquet'), memory_map=True)
+        dataframe = extract()
+        self._store(source, current_fingerprint, dataframe)
+        return dataframe
+
+    def fetch_chunks(self, source, fingerprint, extract, chunksize):
+        '''Yields the cached extract of a source in chunks, streaming it into the cache first if needed.
+
+        On a miss the chunks returned by extract are written to the cache one at a time as they are yielded, so neither
+        extracting nor caching holds the whole source in memory. If a chunk can't be written, caching of the source is
+        abandoned but its chunks are still yielded. If the consumer stops before the last chunk, or the extract fails, the
+        partly written entry is discarded.
+
+        Parameters
+        ----------
+        source: str
+            Name identifying the source, such as its URL.
+        fingerprint: callable
+            Function returning a string that changes whenever the source's data changes. Not called in offline mode.
+        extract: callable
+            Function returning an iterator of pandas DataFrame chunks of the source's data.
+        chunksize: int
+            Number of rows per chunk yielded from a cached entry.
+
+        Returns
+        -------
+        generator of pandas.core.frame.DataFrame
+        '''
+        entry, current_fingerprint = self._lookup(source, fingerprint)
+        if entry is not None:
+            self._touch(entry)
+            parquet_file = pq.ParquetFile(self._path(entry['key'], '.parquet'), memory_map=True)
+            for batch in parquet_file.iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+            return
+        key = self._key(source, current_fingerprint)
+        temporary_path = self._path(key, '.parquet.tmp')
+        writer = None
+        try:
+            for chunk in extract():
+                if writer is not False:
+                    try:
+                        table = pa.Table.from_pandas(arrow_compatible(chunk), preserve_index=False,
+                                                     schema=writer.schema if writer else None)
+                        writer = writer or pq.ParquetWriter(temporary_path, table.schema)
+                        writer.write_table(table)
+                    except (pa.ArrowException, OSError):
+                        # the chunks don't share a schema Arrow can hold, so give up on caching this source
+                        if writer:
+                            writer.close()
+                        writer = False
+                        if os.path.exists(temporary_path):
+                            os.remove(temporary_path)
+                yield chunk
+            if writer:
+                writer.close()
+                writer = None
+                os.replace(temporary_path, self._path(key, '.parquet'))
+                self._write_metadata(key, source, current_fingerprint)
+                self.evict()
+        finally:
+            # only a complete extract is cached
+            if writer:
+                writer.close()
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def evict(self):
+        '''Removes expired entries, then the least recently used entries until the cache fits in max_bytes.'''
+        entries = self._entries()
+        now = time.time()
+        live = []
+        for entry in entries:
+            if self.ttl is not None and now - entry['created'] > self.ttl:
+                self._remove(entry)
+            else:
+                live.append(entry)
+        total = sum(entry['bytes'] for entry in live)
+        for entry in sorted(live, key=lambda entry: entry['last_used']):
+            if total <= self.max_bytes:
+                break
+            self._remove(entry)
+            total -= entry['bytes']
+
+    def _lookup(self, source, fingerprint):
+        '''Returns the metadata of the usable entry for a source, or None if it must be extracted, and its current fingerprint.'''
+        if self.mode == 'offline':
+            # use the newest entry, however old, without contacting the source
+            entries = [entry for entry in self._entries() if entry['source'] == source]
+            if not entries:
+                raise LookupError(f'No cached extract of {source} is available offline')
+            entry = max(entries, key=lambda entry: entry['created'])
+            return entry, entry['fingerprint']
+        current_fingerprint = fingerprint()
+        if self.mode == 'refresh':
+            return None, current_fingerprint
+        entry = self._read_metadata(self._key(source, current_fingerprint))
+        if entry is not None and self.ttl is not None and time.time() - entry['created'] > self.ttl:
+            entry = None
+        return entry, current_fingerprint
+
+    def _store(self, source, fingerprint, dataframe):
+        '''Writes a DataFrame to the cache as a new entry, then evicts entries if the cache has outgrown max_bytes.'''
+        key = self._key(source, fingerprint)
+        temporary_path = self._path(key, '.parquet.tmp')
+        try:
+            arrow_compatible(dataframe).to_parquet(temporary_path)
+        except (pa.ArrowException, OSError):
+            # caching is an optimisation, so a frame Arrow can't hold is simply not cached
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return
+        os.replace(temporary_path, self._path(key, '.parquet'))
+        self._write_metadata(key, source, fingerprint)
+        self.evict()
+
+    def _key(self, source, fingerprint):
+        return hashlib.sha256(f'{source}\0{fingerprint}'.encode()).hexdigest()[:32]
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _write_metadata(self, key, source, fingerprint):
+        now = time.time()
+        entry = {'key': key, 'source': source, 'fingerprint': fingerprint, 'created': now, 'last_used': now,
+                 'bytes': os.path.getsize(self._path(key, '.parquet'))}
+        temporary_path = self._path(key, '.json.tmp')
+        with open(temporary_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temporary_path, self._path(key, '.json'))
+
+    def _read_metadata(self, key):
+        try:
+            with open(self._path(key, '.json'), 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(self._path(key, '.parquet')) else None
+
+    def _touch(self, entry):
+        entry['last_used'] = time.time()
+        temporary_path = self._path(entry['key'], '.json.tmp')
+        with open(temporary_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temporary_path, self._path(entry['key'], '.json'))
+
+    def _entries(self):
+        keys = [name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')]
+        return [entry for entry in map(self._read_metadata, keys) if entry is not None]
+
+    def _remove(self, entry):
+        for suffix in ('.json', '.parquet'):
+            try:
+                os.remove(self._path(entry['key'], suffix))
+            except FileNotFoundError:
+                pass
+
+def arrow_compatible(dataframe):
+    '''Returns the DataFrame with any object columns mixing strings and numbers converted to strings, which Arrow can store.'''
+    converted = {}
+    for column in dataframe.columns[dataframe.dtypes == object]:
+        values = dataframe[column]
+        types = set(map(type, values.dropna()))
+        if len(types) > 1:
+            converted[column] = values.where(values.isna(), values.astype(str))
+    return dataframe.assign(**converted) if converted else dataframe
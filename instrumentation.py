@@ -0,0 +1,262 @@
+import cProfile
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+try:
+    import resource # for peak memory use, which isn't available on Windows
+except ImportError:
+    resource = None
+
+# output settings shared by every thread, set by configure()
+_settings = {'metrics_file': None, 'profile_dir': None}
+_write_lock = threading.Lock()
+_output = None
+# stack of the stages running in each thread, innermost last
+_local = threading.local()
+
+def configure(metrics_file=None, profile_dir=None):
+    '''Turns instrumentation on or off for this process.
+
+    Parameters
+    ----------
+    metrics_file: str, optional
+        Name of file a JSON line is appended to as each stage finishes, or '-' for standard error. If None, no records are
+        written.
+    profile_dir: str, optional
+        Directory a cProfile dump of each outermost stage is written to. If None, stages aren't profiled.
+    '''
+    global _output
+    with _write_lock:
+        if _output not in (None, sys.stderr):
+            _output.close()
+        _output = None
+        _settings['metrics_file'] = metrics_file
+        _settings['profile_dir'] = profile_dir
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+def enabled():
+    '''Returns whether stages are being measured.'''
+    return _settings['metrics_file'] is not None or _settings['profile_dir'] is not None
+
+def counting():
+    '''Returns whether the rows dropped by cleaning rules are being counted, as they are while stages are measured or counts
+    are collected in this thread.'''
+    return enabled() or bool(getattr(_local, 'collecting', 0))
+
+@contextmanager
+def collect():
+    '''Collects the counts recorded in this thread inside a with block into a record, which is yielded, without measuring it.
+
+    For use in worker processes, where instrumentation isn't configured, so that the counts can be sent back to the process
+    that started the work and added to its current stage with merge().
+    '''
+    record = {}
+    _local.stack = getattr(_local, 'stack', None) or []
+    _local.stack.append(record)
+    _local.collecting = getattr(_local, 'collecting', 0) + 1
+    try:
+        yield record
+    finally:
+        _local.collecting -= 1
+        _local.stack.pop()
+
+def merge(record):
+    '''Adds the counts in a record from collect() to the record of the current stage, if there is one.'''
+    for rule, rows in record.get('dropped', {}).items():
+        record_dropped(rule, rows)
+    for column, counts in record.get('date_formats', {}).items():
+        record_date_formats(column, counts)
+
+def current_stage():
+    '''Returns the record of the innermost stage running in this thread, or None if there is none.'''
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+def record_dropped(rule, rows):
+    '''Adds the number of rows dropped by a cleaning rule to the record of the current stage, if there is one.'''
+    record = current_stage()
+    if record is not None:
+        dropped = record.setdefault('dropped', {})
+        dropped[rule] = dropped.get(rule, 0) + rows
+
+def record_date_formats(column, counts):
+    '''Adds the number of values of a date column parsed with each format to the record of the current stage, if there is one.'''
+    record = current_stage()
+    if record is not None:
+        formats = record.setdefault('date_formats', {}).setdefault(column, {})
+        for date_format, rows in counts.items():
+            formats[date_format] = formats.get(date_format, 0) + rows
+
+def _is_dataframe(value):
+    '''Returns whether a value is a pandas DataFrame, without importing pandas for jobs, such as the schema job, that never load it.'''
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(value, pandas.DataFrame)
+
+def _peak_rss_bytes():
+    '''Returns the largest resident set size the process has reached, in bytes, or None where it can't be measured.'''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other platforms kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _emit(record):
+    '''Appends a finished stage's record to the metrics file as a JSON line.'''
+    global _output
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock:
+        if _settings['metrics_file'] is None:
+            return
+        if _output is None:
+            _output = sys.stderr if _settings['metrics_file'] == '-' else open(_settings['metrics_file'], 'a')
+        _output.write(line)
+        _output.flush()
+
+class _Measurement:
+    '''This class accumulates the time spent in a stage, which may be entered several times if the stage is a generator.'''
+    def __init__(self, name, fields):
+        stack = getattr(_local, 'stack', None)
+        parent = stack[-1] if stack else {}
+        # nested stages inherit the job they run in
+        self.record = {'stage': name, 'job': parent.get('job'), **fields, 'started': time.time(),
+                       'wall_seconds': 0.0, 'cpu_seconds': 0.0}
+        self.profiler = None
+
+    def __enter__(self):
+        _local.stack = getattr(_local, 'stack', None) or []
+        _local.stack.append(self.record)
+        # profile only the outermost stage in each thread, as cProfile doesn't nest
+        if _settings['profile_dir'] is not None and len(_local.stack) == 1:
+            self.profiler = self.profiler or cProfile.Profile()
+            self.profiler.enable()
+        self.wall = time.perf_counter()
+        # thread time, so that jobs running in other threads aren't counted
+        self.cpu = time.thread_time()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record['wall_seconds'] += time.perf_counter() - self.wall
+        self.record['cpu_seconds'] += time.thread_time() - self.cpu
+        if self.profiler is not None:
+            self.profiler.disable()
+        _local.stack.pop()
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.record['error'] = repr(exc_value)
+
+    def finish(self):
+        '''Writes the stage's record, and its profile if it was profiled.'''
+        self.record['peak_rss_bytes'] = _peak_rss_bytes()
+        for key in ('wall_seconds', 'cpu_seconds'):
+            self.record[key] = round(self.record[key], 6)
+        if self.profiler is not None:
+            path = os.path.join(_settings['profile_dir'],
+                                f"{self.record['stage']}-{os.getpid()}-{threading.get_ident()}-{time.time_ns()}.prof")
+            self.profiler.dump_stats(path)
+            self.record['profile'] = path
+        _emit(self.record)
+
+@contextmanager
+def stage(name, **fields):
+    '''Measures the code run inside a with block as a stage, writing its record when the block exits.
+
+    The record holds the stage's name, the job it ran in, its wall and CPU time, the process' peak resident set size and
+    any rows dropped per cleaning rule. The record is yielded so that the block can add fields such as row counts.
+
+    Parameters
+    ----------
+    name: str
+        Name of stage.
+    **fields:
+        Extra fields written with the record, such as job='users'.
+
+    Returns
+    -------
+    generator of dict
+    '''
+    if not enabled():
+        yield {}
+        return
+    measurement = _Measurement(name, fields)
+    try:
+        with measurement:
+            yield measurement.record
+    finally:
+        measurement.finish()
+
+def _count_rows(chunks, record, key):
+    '''Yields DataFrame chunks unchanged, adding up their rows in a field of a stage's record.'''
+    record[key] = 0
+    for chunk in chunks:
+        record[key] += len(chunk)
+        yield chunk
+
+def _measure_generator(measurement, generator):
+    '''Yields the chunks of a generator returned by a stage, counting only the time spent producing them towards the stage.'''
+    measurement.record['rows_out'] = 0
+    try:
+        while True:
+            with measurement:
+                try:
+                    chunk = next(generator)
+                except StopIteration:
+                    return
+            measurement.record['rows_out'] += len(chunk)
+            yield chunk
+    finally:
+        generator.close()
+        measurement.finish()
+
+def instrumented(function):
+    '''Decorates a method so that each call is measured as a stage, named after its class and method.
+
+    Rows in are counted from the first DataFrame, or iterator of DataFrame chunks, passed to the method, and rows out from
+    the DataFrame it returns. If the method returns a generator of chunks, the stage lasts until the generator is exhausted
+    and only the time spent producing chunks is counted towards it, not the time the caller spends consuming them. A stage
+    consuming a generator of chunks, such as an upload of cleaned chunks, includes the time spent producing them.
+
+    Parameters
+    ----------
+    function: callable
+        Method to measure.
+
+    Returns
+    -------
+    callable
+    '''
+    name = function.__qualname__
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled():
+            return function(*args, **kwargs)
+        measurement = _Measurement(name, {})
+        record = measurement.record
+        arguments = signature.bind(*args, **kwargs)
+        for parameter, value in list(arguments.arguments.items())[1:]:
+            if _is_dataframe(value):
+                record['rows_in'] = len(value)
+                break
+            if inspect.isgenerator(value) or isinstance(value, (list, tuple)) and value \
+                    and all(_is_dataframe(chunk) for chunk in value):
+                arguments.arguments[parameter] = _count_rows(value, record, 'rows_in')
+                break
+        try:
+            with measurement:
+                result = function(*arguments.args, **arguments.kwargs)
+        except BaseException:
+            measurement.finish()
+            raise
+        if inspect.isgenerator(result):
+            return _measure_generator(measurement, result)
+        if _is_dataframe(result):
+            record['rows_out'] = len(result)
+        measurement.finish()
+        return result
+    return wrapper
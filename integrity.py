@@ -0,0 +1,160 @@
+import functools
+import operator
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect
+import instrumentation
+from instrumentation import instrumented
+
+class IntegrityChecker:
+    '''This class checks the foreign keys of cleaned DataFrame chunks against the keys of the tables they reference.
+
+    The keys of each referenced table are read from the local database once, as the dimension tables are loaded before the
+    orders, and every chunk is then checked in memory with hash-set membership tests, one vectorised isin() per foreign key.
+    Orphan rows, whose foreign keys match no row of the table they reference, are written to a reject report, and in
+    'quarantine' mode are also removed from the chunk before it is uploaded. As no orphan rows are loaded, the foreign keys
+    can then be added without the database scanning the whole table to check them.
+
+    Attributes
+    ----------
+    table:
+        This is the declared sqlalchemy Table whose foreign keys are checked, such as table_schemas.orders_table.
+    mode:
+        This is 'quarantine' to remove orphan rows from the chunks, or 'flag' to only report them.
+    report_file:
+        This is the name of the CSV file orphan rows are written to, or None.
+    keys:
+        This is a dictionary of the keys of the referenced table of each foreign key column, read by load_keys().
+    rejected:
+        This is a dictionary of the number of orphan rows found for each foreign key column.
+
+    Methods
+    -------
+    __init__(self, table, mode, report_file):
+        Initialises an instance of the IntegrityChecker class.
+    load_keys(self, connector):
+        Reads the keys of every table referenced by the checked table's foreign keys from the database.
+    check(self, dataframe):
+        Returns a chunk without its orphan rows in 'quarantine' mode, or unchanged in 'flag' mode, reporting the orphans.
+    '''
+    modes = ('quarantine', 'flag')
+
+    def __init__(self, table, mode='quarantine', report_file=None):
+        '''Initialises an instance of the IntegrityChecker class.
+
+        Parameters
+        ----------
+        table: sqlalchemy.Table
+            Declared table whose foreign keys are checked.
+        mode: str
+            Either 'quarantine' or 'flag'.
+        report_file: str, optional
+            Name of CSV file to write orphan rows to, replaced by the first chunk with orphans. If None, no report is written.
+        '''
+        if mode not in self.modes:
+            raise ValueError(f"mode must be one of {', '.join(self.modes)}, not {mode!r}")
+        self.table = table
+        self.mode = mode
+        self.report_file = report_file
+        self.keys = {}
+        self.rejected = {}
+        self._integer_keys = {}
+        self._report_started = False
+        self._lock = threading.Lock()
+
+    def load_keys(self, connector):
+        '''Reads the keys of every table referenced by the checked table's foreign keys from the database.
+
+        Foreign keys referencing a table that doesn't exist in the database, such as one that has never been loaded, are not
+        checked.
+
+        Parameters
+        ----------
+        connector: DatabaseConnector
+            Connector for the database the referenced tables have been loaded into.
+
+        Returns
+        -------
+        None
+        '''
+        with connector.init_db_engine().connect() as connection:
+            quote = connection.dialect.identifier_preparer.quote
+            # in column order, so that the report names broken keys in the same order every time
+            foreign_keys = [foreign_key for column in self.table.columns for foreign_key in column.foreign_keys]
+            for foreign_key in foreign_keys:
+                referenced = foreign_key.column
+                if not inspect(connection).has_table(referenced.table.name):
+                    continue
+                keys = connection.exec_driver_sql(f'SELECT {quote(referenced.name)} FROM {quote(referenced.table.name)}')
+                self.keys[foreign_key.parent.name] = pd.Index([key for key, in keys]).astype(str)
+
+    @instrumented
+    def check(self, dataframe):
+        '''Returns a chunk without its orphan rows in 'quarantine' mode, or unchanged in 'flag' mode, reporting the orphans.
+
+        Each orphan row is counted in rejected against every foreign key it breaks, and written to the report file with a
+        missing_keys column naming them. When instrumentation is enabled, each removed row is also counted as dropped by the
+        first foreign key it breaks.
+
+        Parameters
+        ----------
+        dataframe: pandas.core.frame.DataFrame
+            Cleaned pandas DataFrame chunk of the checked table.
+
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+            Chunk to be uploaded.
+        '''
+        found = {column: self._key_found(dataframe[column], column) for column in self.keys}
+        if not found:
+            return dataframe
+        valid = functools.reduce(operator.and_, found.values())
+        if valid.all():
+            return dataframe
+        with self._lock:
+            for column, matched in found.items():
+                self.rejected[column] = self.rejected.get(column, 0) + int((~matched).sum())
+        self._report(dataframe.loc[~valid], {column: matched[~valid] for column, matched in found.items()})
+        if self.mode == 'flag':
+            return dataframe
+        if instrumentation.enabled():
+            remaining = np.ones(len(dataframe), dtype=bool)
+            for column, matched in found.items():
+                instrumentation.record_dropped(f'orphan_{column}', int((remaining & ~matched).sum()))
+                remaining &= matched
+        return dataframe.loc[valid]
+
+    def _key_found(self, values, column):
+        '''Returns a boolean array of whether each value of a column is a key of the table it references, or null, which is allowed.'''
+        keys = self.keys[column]
+        if pd.api.types.is_integer_dtype(values):
+            # compare integer columns, such as card numbers read from the RDS database, as integers rather than converting
+            # every value to a string; only keys of digits alone can match, and converting them straight to int64 keeps every
+            # digit of a 16 digit card number, which a detour through float64 would round
+            if column not in self._integer_keys:
+                digits = keys[keys.str.fullmatch(r'\d{1,19}')]
+                # of 19 digits, only those up to the largest int64 fit, which compare in order as strings of the same length
+                digits = digits[(digits.str.len() < 19) | (digits <= str(np.iinfo('int64').max))]
+                self._integer_keys[column] = pd.Index(digits.astype('int64'))
+            keys = self._integer_keys[column]
+        elif not pd.api.types.is_string_dtype(values):
+            values = values.astype(str).where(values.notna())
+        found = values.isin(keys).to_numpy()
+        # only look for nulls among the few values that weren't found
+        missing = ~found
+        if missing.any():
+            found[missing] = values[missing].isna().to_numpy()
+        return found
+
+    def _report(self, orphans, found):
+        '''Appends orphan rows to the report file, with the foreign keys each breaks.'''
+        if self.report_file is None:
+            return
+        missing = [' '.join(column for column, matched in zip(found, row) if not matched) for row in zip(*found.values())]
+        orphans = orphans.assign(missing_keys=missing)
+        with self._lock:
+            orphans.to_csv(self.report_file, mode='a' if self._report_started else 'w', header=not self._report_started,
+                           index=False)
+            self._report_started = True
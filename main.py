@@ -1,31 +1,46 @@
-from data_extraction import DataExtractor
-from data_cleaning import DataCleaning
-from database_utils import DatabaseConnector
+import argparse
+from pipeline import JOBS, Pipeline
 
 if __name__ == "__main__":
-    # instatiate classes for connecting to databases
-    aws_connector = DatabaseConnector('aws_creds.yaml')
-    local_connector = DatabaseConnector('local_creds.yaml')
-    # instantiate class for extracting data from external sources
-    extractor = DataExtractor()
-    # instantiate class for cleaning data
-    cleaner = DataCleaning()
-    # extract users data and upload to local database
-    users = extractor.read_rds_table(aws_connector, 'legacy_users')
-    local_connector.upload_to_db(cleaner.clean_user_data(users), 'dim_users')
-    # extract cards data and upload to local database
-    cards = extractor.retrieve_pdf_data('https://data-handling-public.s3.eu-west-1.amazonaws.com/card_details.pdf')
-    local_connector.upload_to_db(cleaner.clean_card_data(cards), 'dim_card_details')
-    # extract store data and upload to local database
-    stores = extractor.retrieve_stores_data()
-    local_connector.upload_to_db(cleaner.clean_store_data(stores), 'dim_store_details')
-    # extract product data and upload to local database
-    products = extractor.extract_from_s3('s3://data-handling-public/products.csv')
-    local_connector.upload_to_db(cleaner.clean_products_data(products), 'dim_products')
-    # extract orders data and upload to local database
-    orders = extractor.read_rds_table(aws_connector, 'orders_table')
-    local_connector.upload_to_db(cleaner.clean_orders_data(orders), 'orders_table')
-    # extract order date and time event data and upload to local database
-    date_events = extractor.extract_from_s3('https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json')
-    local_connector.upload_to_db(cleaner.clean_date_events(date_events), 'dim_date_times')
-
+    parser = argparse.ArgumentParser(description='Extract, clean and load the business data into the local database.')
+    parser.add_argument('job', nargs='*', metavar='JOB',
+                        help=f"jobs to run, of {', '.join(JOBS)} (default: all)")
+    parser.add_argument('--max-workers', type=int, help='maximum number of jobs run at once')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='run jobs in a pool of threads or of processes (default: thread)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='load only the orders and date events added since the last load')
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument('--offline', dest='cache_mode', action='store_const', const='offline', default='normal',
+                            help='clean and load the cached extracts without contacting the sources')
+    cache_mode.add_argument('--refresh', dest='cache_mode', action='store_const', const='refresh',
+                            help='extract everything from the sources again, replacing the cached extracts')
+    cache_mode.add_argument('--no-cache', dest='cache_mode', action='store_const', const=None,
+                            help="don't cache extracts")
+    parser.add_argument('--cache-dir', default='.extract_cache', help='directory to cache extracts in')
+    parser.add_argument('--clean-workers', type=int, default=1,
+                        help='number of processes each table, or chunk of a table, is cleaned across (default: 1)')
+    parser.add_argument('--integrity', choices=['quarantine', 'flag', 'off'], default='quarantine',
+                        help='leave orders breaking a foreign key out of the load, only report them, or skip the check '
+                             '(default: quarantine)')
+    parser.add_argument('--reject-file', default='rejected_orders.csv',
+                        help='CSV file orders breaking a foreign key are written to')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="append a JSON line of timings, row counts and memory use per stage to FILE ('-' for stderr)")
+    parser.add_argument('--profile-dir', metavar='DIR', help='write a cProfile dump of each job to DIR')
+    args = parser.parse_args()
+    # checked here, as argparse rejects an empty list of positional arguments restricted to choices
+    unknown = [job for job in args.job if job not in JOBS]
+    if unknown:
+        parser.error(f"unknown jobs: {', '.join(unknown)} (choose from {', '.join(JOBS)})")
+    # the rows beyond a watermark aren't cached, so would be read from the source anyway
+    if args.incremental and args.cache_mode == 'offline':
+        parser.error('argument --incremental: not allowed with argument --offline')
+    # run the selected jobs, each starting as soon as the jobs it depends on have finished
+    with Pipeline('aws_creds.yaml', 'local_creds.yaml', incremental=args.incremental,
+                  cache_dir=args.cache_dir if args.cache_mode else None, cache_mode=args.cache_mode or 'normal',
+                  metrics_file=args.metrics, profile_dir=args.profile_dir, clean_workers=args.clean_workers,
+                  integrity_mode=None if args.integrity == 'off' else args.integrity, reject_file=args.reject_file) as pipeline:
+        timings = pipeline.run(args.job or None, max_workers=args.max_workers, executor=args.executor)
+    for job, seconds in timings.items():
+        print(f'{job} finished in {seconds:.1f}s')
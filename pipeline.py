@@ -0,0 +1,391 @@
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import instrumentation
+from database_utils import DatabaseConnector, HighWaterMark
+from table_schemas import metadata
+# the extraction, cleaning and integrity modules, which load pandas, pyarrow and the libraries of every source, are imported
+# when a job first uses them, so that the schema and summaries jobs start without them
+
+# number of rows streamed at a time from the large RDS tables
+RDS_CHUNKSIZE = 50000
+# smallest number of rows worth sending to another process to clean, so that each RDS chunk is split between the clean
+# workers while tables of a few hundred rows, such as the stores, are cleaned in the job's own thread
+MIN_CLEAN_CHUNK_ROWS = 5000
+CARD_DETAILS_LINK = 'https://data-handling-public.s3.eu-west-1.amazonaws.com/card_details.pdf'
+PRODUCTS_ENDPOINT = 's3://data-handling-public/products.csv'
+# read every text column of the products file as strings, rather than inferring types from its first block
+PRODUCTS_DTYPES = dict.fromkeys(['product_name', 'product_price', 'weight', 'category', 'EAN', 'date_added', 'uuid',
+                                 'removed', 'product_code'], 'string')
+DATE_DETAILS_ENDPOINT = 'https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json'
+
+# each job and the jobs that must finish before it starts
+JOBS = {
+    'users': (),
+    'cards': (),
+    'stores': (),
+    'products': (),
+    'orders': (),
+    'date_times': (),
+    'schema': ('users', 'cards', 'stores', 'products', 'orders', 'date_times'),
+    'summaries': ('schema',),
+}
+# jobs that must also finish first when the orders are checked against the keys of the loaded dimension tables
+INTEGRITY_DEPENDENCIES = {'orders': ('users', 'cards', 'stores', 'products', 'date_times')}
+
+def _run_job_in_process(options, job):
+    '''Runs a single job of a Pipeline rebuilt from its options, for use as a process pool task.'''
+    with Pipeline(**options) as pipeline:
+        return pipeline.run_job(job)
+
+class Pipeline:
+    '''This class runs the extract, clean and upload jobs of the pipeline, in parallel where they are independent.
+
+    The jobs and their dependencies are declared in the JOBS dictionary. The five dimension table loads, which create each
+    table with its declared types and primary key, are independent of each other. Unless integrity_mode is None, the orders
+    load waits for them, so that orders referencing rows missing from them can be quarantined, and the schema job, which
+    adds the foreign keys, waits for all of the loads to finish. The summaries job then creates and refreshes the
+    materialized summaries the business queries read from.
+
+    Attributes
+    ----------
+    options:
+        This is the dictionary of arguments the pipeline was created with, used to rebuild it in worker processes.
+    source_connector:
+        This is the DatabaseConnector for the AWS RDS database the users and orders tables are extracted from.
+    target_connector:
+        This is the DatabaseConnector for the local database the cleaned tables are uploaded to, creating each table with the
+        types, keys and indexes declared in table_schemas.py.
+    schema_file:
+        This is the name of the SQL file run by the schema job.
+    summary_file:
+        This is the name of the SQL file creating the materialized summaries refreshed by the summaries job.
+    incremental:
+        This is whether the orders and date times jobs load only the rows added since their last load.
+    cache:
+        This is the ExtractCache raw extracts are kept in, or None if extracts aren't cached, created on first use.
+    metrics_file:
+        This is the file a JSON line of timings, row counts and memory use is appended to as each stage finishes, or None.
+    profile_dir:
+        This is the directory a cProfile dump of each stage is written to, or None.
+    clean_workers:
+        This is the number of processes each table, or chunk of a table, is cleaned across.
+    integrity_mode:
+        This is 'quarantine' to leave orders breaking a foreign key out of the load, 'flag' to only report them, or None.
+    reject_file:
+        This is the name of the CSV file orders breaking a foreign key are written to.
+    extractor:
+        This is the DataExtractor used by every job, created on first use.
+    cleaner:
+        This is the DataCleaning instance used by every job, created on first use.
+    clean_pool:
+        This is the pool of clean_workers processes every job cleans in, started on first use.
+
+    Methods
+    -------
+    __init__(self, source_creds, target_creds, schema_file, incremental, cache_dir, cache_mode, metrics_file, profile_dir,
+             clean_workers, summary_file, integrity_mode, reject_file):
+        Initialises an instance of the Pipeline class.
+    close(self):
+        Disposes of the database connectors' connection pools.
+    load_users(self), load_cards(self), load_stores(self), load_products(self), load_orders(self), load_date_times(self):
+        Extracts, cleans and uploads a single table.
+    apply_schema(self):
+        Runs the schema SQL file against the local database, then validates the foreign keys unless orders were quarantined.
+    refresh_summaries(self):
+        Creates any missing materialized summaries in the local database, then refreshes them all.
+    dependencies(self, job):
+        Returns the jobs that must finish before a job starts.
+    run_job(self, job):
+        Runs a single job by name.
+    run(self, jobs, max_workers, executor):
+        Runs the given jobs, starting each as soon as the jobs it depends on have finished.
+    '''
+    def __init__(self, source_creds='aws_creds.yaml', target_creds='local_creds.yaml', schema_file='database_schema.sql',
+                 incremental=False, cache_dir='.extract_cache', cache_mode='normal', metrics_file=None, profile_dir=None,
+                 clean_workers=1, summary_file='summary_views.sql', integrity_mode='quarantine',
+                 reject_file='rejected_orders.csv'):
+        '''Initialises an instance of the Pipeline class.
+
+        Parameters
+        ----------
+        source_creds: str
+            Name of YAML file containing the AWS RDS database credentials.
+        target_creds: str
+            Name of YAML file containing the local database credentials.
+        schema_file: str
+            Name of SQL file run by the schema job.
+        incremental: bool
+            Whether the orders and date times jobs load only the rows added since their last load. The first load of each
+            table, and any load without a recorded watermark, is always a full load. The rows beyond a watermark are always
+            extracted from the source, so incremental loads can't be combined with the 'offline' cache_mode.
+        cache_dir: str, optional
+            Directory to cache raw extracts in. If None, extracts aren't cached.
+        cache_mode: str
+            'normal' to reuse cached extracts while their source is unchanged, 'offline' to reuse them without contacting the
+            sources, or 'refresh' to extract everything again.
+        metrics_file: str, optional
+            File to append a JSON line to as each job and each extract, clean and upload stage finishes, or '-' for standard
+            error. If None, nothing is measured.
+        profile_dir: str, optional
+            Directory to write a cProfile dump of each job to. If None, jobs aren't profiled.
+        clean_workers: int
+            Number of processes each table, or chunk of a table, is cleaned across. With 1 it is cleaned in the job's own
+            thread or process.
+        summary_file: str
+            Name of SQL file creating the materialized summaries refreshed by the summaries job.
+        integrity_mode: str, optional
+            'quarantine' to leave orders whose foreign keys match no row of the loaded dimension tables out of the load, 'flag'
+            to load them anyway, or None not to check them. Either way they are written to reject_file.
+        reject_file: str
+            Name of CSV file to write orders breaking a foreign key to.
+        '''
+        if incremental and cache_dir is not None and cache_mode == 'offline':
+            raise ValueError("Incremental loads extract from the source, so can't be run in the 'offline' cache_mode")
+        self.options = {'source_creds': source_creds, 'target_creds': target_creds, 'schema_file': schema_file,
+                        'incremental': incremental, 'cache_dir': cache_dir, 'cache_mode': cache_mode,
+                        'metrics_file': metrics_file, 'profile_dir': profile_dir, 'clean_workers': clean_workers,
+                        'summary_file': summary_file, 'integrity_mode': integrity_mode, 'reject_file': reject_file}
+        self.source_connector = DatabaseConnector(source_creds)
+        self.target_connector = DatabaseConnector(target_creds, metadata=metadata)
+        self.schema_file = schema_file
+        self.summary_file = summary_file
+        self.incremental = incremental
+        self.metrics_file = metrics_file
+        self.profile_dir = profile_dir
+        self.clean_workers = clean_workers
+        self.integrity_mode = integrity_mode
+        self.reject_file = reject_file
+        self._helpers = {}
+        self._helpers_lock = threading.RLock()
+        if metrics_file is not None or profile_dir is not None:
+            instrumentation.configure(metrics_file, profile_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        '''Disposes of the database connectors' connection pools, and shuts down the clean workers if they were started.'''
+        self.source_connector.dispose()
+        self.target_connector.dispose()
+        with self._helpers_lock:
+            pool = self._helpers.pop('clean_pool', None)
+        if pool is not None:
+            pool.shutdown()
+
+    def _shared(self, name, create):
+        '''Returns the helper of a given name shared by every job, creating it with create() the first time it is used.'''
+        with self._helpers_lock:
+            if name not in self._helpers:
+                self._helpers[name] = create()
+            return self._helpers[name]
+
+    @property
+    def cache(self):
+        if self.options['cache_dir'] is None:
+            return None
+        def create():
+            from extract_cache import ExtractCache
+            return ExtractCache(self.options['cache_dir'], mode=self.options['cache_mode'])
+        return self._shared('cache', create)
+
+    @property
+    def extractor(self):
+        def create():
+            from data_extraction import DataExtractor
+            return DataExtractor(cache=self.cache)
+        return self._shared('extractor', create)
+
+    @property
+    def cleaner(self):
+        def create():
+            from data_cleaning import DataCleaning
+            return DataCleaning()
+        return self._shared('cleaner', create)
+
+    @property
+    def clean_pool(self):
+        def create():
+            from data_cleaning import clean_pool
+            return clean_pool(self.clean_workers)
+        return self._shared('clean_pool', create)
+
+    def load_users(self):
+        '''Extracts users data and uploads it to the local database.'''
+        users = self.extractor.read_rds_table(self.source_connector, 'legacy_users', chunksize=RDS_CHUNKSIZE)
+        self.target_connector.upload_to_db((self._clean('clean_user_data', chunk) for chunk in users), 'dim_users')
+
+    def load_cards(self):
+        '''Extracts cards data and uploads it to the local database.'''
+        cards = self.extractor.retrieve_pdf_data(CARD_DETAILS_LINK)
+        self.target_connector.upload_to_db(self._clean('clean_card_data', cards), 'dim_card_details')
+
+    def load_stores(self):
+        '''Extracts store data and uploads it to the local database.'''
+        stores = self.extractor.retrieve_stores_data()
+        self.target_connector.upload_to_db(self._clean('clean_store_data', stores), 'dim_store_details')
+
+    def load_products(self):
+        '''Extracts product data and uploads it to the local database.'''
+        products = self.extractor.extract_from_s3(PRODUCTS_ENDPOINT, dtypes=PRODUCTS_DTYPES)
+        self.target_connector.upload_to_db(self._clean('clean_products_data', products), 'dim_products')
+
+    def load_orders(self):
+        '''Extracts orders data, or only the orders added since the last load, and uploads it to the local database.'''
+        high_water_mark = HighWaterMark('index', self._previous_watermark('orders_table'))
+        orders = self.extractor.read_rds_table(self.source_connector, 'orders_table', chunksize=RDS_CHUNKSIZE,
+                                               watermark_column='index', watermark=high_water_mark.value)
+        cleaned = (self._clean('clean_orders_data', chunk) for chunk in high_water_mark.track(orders))
+        if self.integrity_mode is not None:
+            from integrity import IntegrityChecker
+            checker = IntegrityChecker(metadata.tables['orders_table'], self.integrity_mode, self.reject_file)
+            checker.load_keys(self.target_connector)
+            cleaned = (checker.check(chunk) for chunk in cleaned)
+        self._load(cleaned, 'orders_table', high_water_mark)
+
+    def load_date_times(self):
+        '''Extracts order date and time event data, or only the events added since the last load, and uploads it to the local database.'''
+        high_water_mark = HighWaterMark(None, self._previous_watermark('dim_date_times'))
+        date_events = self.extractor.extract_from_s3(DATE_DETAILS_ENDPOINT, watermark=high_water_mark.value)
+        cleaned = (self._clean('clean_date_events', chunk) for chunk in high_water_mark.track(date_events))
+        self._load(cleaned, 'dim_date_times', high_water_mark, conflict_columns=['date_uuid'])
+
+    def _clean(self, method, dataframe):
+        '''Cleans a table, or chunk of a table, with a DataCleaning method split evenly across clean_workers processes.
+
+        The processes are started once and kept for every table and chunk, so each chunk streamed from RDS is split between
+        them as it arrives.
+        '''
+        chunk_rows = max(MIN_CLEAN_CHUNK_ROWS, math.ceil(len(dataframe) / self.clean_workers))
+        return self.cleaner.parallel_clean(method, dataframe, n_workers=self.clean_workers, chunk_rows=chunk_rows,
+                                           executor=self.clean_pool if self.clean_workers > 1 else None)
+
+    def _previous_watermark(self, table):
+        '''Returns the watermark of the last load of a table if loading incrementally, otherwise None for a full load.'''
+        return self.target_connector.read_watermark(table) if self.incremental else None
+
+    def _load(self, cleaned, table, high_water_mark, conflict_columns=None):
+        '''Upserts the new rows of an incremental load, or replaces the table on a full load, recording its watermark.'''
+        if self.incremental and high_water_mark.value is not None:
+            self.target_connector.upsert_to_db(cleaned, table, conflict_columns, high_water_mark=high_water_mark)
+        else:
+            self.target_connector.upload_to_db(cleaned, table, high_water_mark=high_water_mark)
+
+    def apply_schema(self):
+        '''Runs the schema SQL file against the local database, then validates the foreign keys unless orders were quarantined.
+
+        The schema file adds the foreign keys NOT VALID. Quarantined orders are already known to match them, but otherwise
+        the orders are scanned once to check them, which fails if any order is an orphan.
+        '''
+        self.target_connector.run_sql_file(self.schema_file)
+        if self.integrity_mode != 'quarantine':
+            self.target_connector.validate_constraints('orders_table')
+
+    def refresh_summaries(self):
+        '''Creates any missing materialized summaries in the local database, then refreshes them all.
+
+        Full loads keep the tables they replace, so the summaries built from them can still be read. If there are any, every
+        summary is built afresh over the new tables, each filled once, and swapped in before the old tables are dropped.
+        Otherwise, as after incremental loads, summaries that don't exist yet are created, empty, and the rest are refreshed
+        concurrently. Either way the business queries can keep reading the old figures meanwhile.
+        '''
+        if self.target_connector.retired_tables():
+            self.target_connector.rebuild_materialized_views(self.summary_file)
+        else:
+            self.target_connector.run_sql_file(self.summary_file)
+            self.target_connector.refresh_materialized_views()
+
+    def dependencies(self, job):
+        '''Returns the jobs that must finish before a job starts.
+
+        Parameters
+        ----------
+        job: str
+            Name of job, one of the keys of JOBS.
+
+        Returns
+        -------
+        tuple of str
+        '''
+        if self.integrity_mode is None:
+            return JOBS[job]
+        return JOBS[job] + INTEGRITY_DEPENDENCIES.get(job, ())
+
+    def run_job(self, job):
+        '''Runs a single job by name.
+
+        Parameters
+        ----------
+        job: str
+            Name of job, one of the keys of JOBS.
+
+        Returns
+        -------
+        float
+            Number of seconds the job took.
+        '''
+        start = time.perf_counter()
+        with instrumentation.stage('job', job=job):
+            if job == 'schema':
+                self.apply_schema()
+            elif job == 'summaries':
+                self.refresh_summaries()
+            else:
+                getattr(self, f'load_{job}')()
+        return time.perf_counter() - start
+
+    def run(self, jobs=None, max_workers=None, executor='thread'):
+        '''Runs the given jobs, starting each as soon as the jobs it depends on have finished.
+
+        Jobs are submitted to a pool of threads, sharing this pipeline's connectors and their connection pools, or to a pool
+        of processes, each building its own pipeline. Dependencies on jobs that were not selected are treated as already
+        met. If a job fails, no further jobs are started and its exception is raised once the running jobs have finished.
+
+        Parameters
+        ----------
+        jobs: iterable of str, optional
+            Names of jobs to run. If None, every job is run.
+        max_workers: int, optional
+            Maximum number of jobs run at once. If None, the pool's default is used.
+        executor: str
+            Either 'thread' or 'process'.
+
+        Returns
+        -------
+        dict
+            Number of seconds each job took, keyed by job name.
+        '''
+        selected = list(JOBS) if jobs is None else list(jobs)
+        unknown = set(selected) - set(JOBS)
+        if unknown:
+            raise ValueError(f"Unknown jobs: {', '.join(sorted(unknown))}")
+        # dependencies still to finish for each job waiting to start
+        waiting = {job: set(self.dependencies(job)) & set(selected) for job in selected}
+        running = {}
+        timings = {}
+        pool_class = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}[executor]
+        with pool_class(max_workers=max_workers) as pool:
+            while waiting or running:
+                for job in [job for job, dependencies in waiting.items() if not dependencies]:
+                    del waiting[job]
+                    if executor == 'thread':
+                        future = pool.submit(self.run_job, job)
+                    else:
+                        future = pool.submit(_run_job_in_process, self.options, job)
+                    running[future] = job
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    if future.exception() is not None:
+                        # start nothing else, and let the running jobs finish before raising
+                        waiting.clear()
+                        wait(running)
+                        raise future.exception()
+                    timings[job] = future.result()
+                    for dependencies in waiting.values():
+                        dependencies.discard(job)
+        return timings
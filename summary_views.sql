@@ -0,0 +1,111 @@
+-- Materialized summaries of the orders the business queries read from, so that they no longer join orders_table to the
+-- dimension tables on every run. Each view is created empty if it doesn't exist, then filled by the summaries job with
+-- REFRESH MATERIALIZED VIEW. Every view has a unique index, so once filled it can be refreshed concurrently, without
+-- blocking the queries reading it.
+
+-- Sales of each type of store in each country. Orders are counted, as in the original queries, if their store is found,
+-- and their sales added up if their product is found too, so an order with a missing product still counts as a sale but
+-- adds nothing to total_sales, which is NULL for a store type none of whose orders have a product. As it has a row per store
+-- type and country, however many orders there are, the queries reading it take the same time as the orders grow.
+CREATE MATERIALIZED VIEW IF NOT EXISTS store_type_sales AS
+SELECT
+    store_type,
+    country_code,
+    COUNT(ot.date_uuid) AS number_of_sales,
+    SUM(product_quantity) AS product_quantity,
+    SUM(ROUND((product_price * product_quantity)::numeric, 2)) AS total_sales
+FROM
+    orders_table AS ot
+INNER JOIN
+    dim_store_details AS dsd ON ot.store_code = dsd.store_code
+LEFT JOIN
+    dim_products AS dp ON ot.product_code = dp.product_code
+GROUP BY
+    store_type, country_code
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS store_type_sales_key ON store_type_sales (store_type, country_code);
+
+-- Daily sales of each product.
+CREATE MATERIALIZED VIEW IF NOT EXISTS daily_product_sales AS
+SELECT
+    year,
+    month,
+    day,
+    ot.product_code,
+    category,
+    COUNT(*) AS number_of_sales,
+    SUM(product_quantity) AS product_quantity,
+    SUM(ROUND((product_price * product_quantity)::numeric, 2)) AS total_sales
+FROM
+    orders_table AS ot
+INNER JOIN
+    dim_date_times AS ddt ON ot.date_uuid = ddt.date_uuid
+INNER JOIN
+    dim_products AS dp ON ot.product_code = dp.product_code
+GROUP BY
+    year, month, day, ot.product_code, category
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS daily_product_sales_key ON daily_product_sales (year, month, day, product_code);
+CREATE INDEX IF NOT EXISTS daily_product_sales_category ON daily_product_sales (category);
+
+-- Monthly sales, which the business queries read from, with a row a month however many orders there are. It is built from
+-- daily_product_sales, so it joins the orders only to the dates and products, as the original queries did, and must be
+-- created, and refreshed, after it.
+CREATE MATERIALIZED VIEW IF NOT EXISTS monthly_sales AS
+SELECT
+    year,
+    month,
+    SUM(total_sales) AS total_sales
+FROM
+    daily_product_sales
+GROUP BY
+    year, month
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS monthly_sales_key ON monthly_sales (year, month);
+
+-- Number of stores and staff in each locality of each country.
+CREATE MATERIALIZED VIEW IF NOT EXISTS store_counts AS
+SELECT
+    country_code,
+    locality,
+    COUNT(store_code) AS total_no_stores,
+    SUM(staff_numbers) AS total_staff_numbers
+FROM
+    dim_store_details
+GROUP BY
+    country_code, locality
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS store_counts_key ON store_counts (country_code, locality);
+
+-- Average time between consecutive sales, by the year of the first of them.
+CREATE MATERIALIZED VIEW IF NOT EXISTS sale_intervals_by_year AS
+WITH all_orders_by_time AS (
+SELECT
+    year,
+    TO_TIMESTAMP(year || '-' || month || '-' || day || ' ' || timestamp, 'YYYY-MM-DD HH24:MI:SS') AS timestamp
+FROM
+    orders_table AS ot
+INNER JOIN
+    dim_date_times AS ddt ON ot.date_uuid = ddt.date_uuid
+), lead_table AS (
+SELECT
+    year,
+    timestamp,
+    LEAD(timestamp) OVER (ORDER BY timestamp) AS next
+FROM
+    all_orders_by_time
+)
+SELECT
+    year,
+    AVG(next - timestamp) AS actual_time_taken
+FROM
+    lead_table
+GROUP BY
+    year
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS sale_intervals_by_year_key ON sale_intervals_by_year (year);
@@ -0,0 +1,80 @@
+from sqlalchemy import BOOLEAN, DATE, FLOAT, SMALLINT, TEXT, VARCHAR, Column, ForeignKey, MetaData, Table
+from sqlalchemy.dialects.postgresql import UUID
+
+# the declared tables of the local database, which DatabaseConnector creates with these types, keys and indexes as it loads them
+metadata = MetaData()
+# stored as UUID on Postgresql and as text elsewhere, such as SQLite
+UUID_TYPE = VARCHAR(36).with_variant(UUID(), 'postgresql')
+
+dim_users = Table(
+    'dim_users', metadata,
+    Column('first_name', VARCHAR(255)),
+    Column('last_name', VARCHAR(255)),
+    Column('date_of_birth', DATE),
+    Column('company', TEXT),
+    Column('email_address', TEXT),
+    Column('address', TEXT),
+    Column('country', TEXT),
+    Column('country_code', VARCHAR(2)),
+    Column('phone_number', TEXT),
+    Column('join_date', DATE),
+    Column('user_uuid', UUID_TYPE, primary_key=True),
+)
+
+dim_card_details = Table(
+    'dim_card_details', metadata,
+    Column('card_number', VARCHAR(19), primary_key=True),
+    Column('expiry_date', VARCHAR(5)),
+    Column('card_provider', TEXT),
+    Column('date_payment_confirmed', DATE),
+)
+
+dim_store_details = Table(
+    'dim_store_details', metadata,
+    Column('address', TEXT),
+    Column('longitude', FLOAT),
+    Column('locality', VARCHAR(255)),
+    Column('store_code', VARCHAR(12), primary_key=True),
+    Column('staff_numbers', SMALLINT),
+    Column('opening_date', DATE),
+    Column('store_type', VARCHAR(255)),
+    Column('latitude', FLOAT),
+    Column('country_code', VARCHAR(3)),
+    Column('continent', VARCHAR(255)),
+)
+
+dim_products = Table(
+    'dim_products', metadata,
+    Column('product_name', TEXT),
+    Column('product_price', FLOAT),
+    Column('weight', FLOAT),
+    Column('category', TEXT),
+    Column('EAN', VARCHAR(17)),
+    Column('date_added', DATE),
+    Column('uuid', UUID_TYPE),
+    Column('still_available', BOOLEAN),
+    Column('product_code', VARCHAR(11), primary_key=True),
+    Column('weight_class', VARCHAR(14)),
+)
+
+dim_date_times = Table(
+    'dim_date_times', metadata,
+    Column('timestamp', TEXT),
+    Column('month', VARCHAR(2)),
+    Column('year', VARCHAR(4)),
+    Column('day', VARCHAR(2)),
+    Column('time_period', VARCHAR(10)),
+    Column('date_uuid', UUID_TYPE, primary_key=True),
+)
+
+# the orders are only read in full, by the joins refreshing the summaries, so they have no indexes to rebuild on every load;
+# their foreign keys are checked by an IntegrityChecker as they are loaded, and added by the schema job
+orders_table = Table(
+    'orders_table', metadata,
+    Column('date_uuid', UUID_TYPE, ForeignKey('dim_date_times.date_uuid')),
+    Column('user_uuid', UUID_TYPE, ForeignKey('dim_users.user_uuid')),
+    Column('card_number', VARCHAR(19), ForeignKey('dim_card_details.card_number')),
+    Column('store_code', VARCHAR(12), ForeignKey('dim_store_details.store_code')),
+    Column('product_code', VARCHAR(11), ForeignKey('dim_products.product_code')),
+    Column('product_quantity', SMALLINT),
+)